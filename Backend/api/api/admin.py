@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Turma, Patient, Estagiario, Availability, PatientAvailability, Schedule
+from .models import (
+    Turma, Patient, Estagiario, Availability, PatientAvailability, Schedule, AvailabilityRule, PatientAvailabilityRule,
+    Room, FeedToken,
+)
 
 
 @admin.register(Turma)
@@ -32,8 +35,32 @@ class PatientAvailabilityAdmin(admin.ModelAdmin):
     list_filter = ('patient',)
 
 
+@admin.register(Room)
+class RoomAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'capacity', 'opens_at', 'closes_at', 'weekdays', 'is_active')
+    search_fields = ('name',)
+
+
 @admin.register(Schedule)
 class ScheduleAdmin(admin.ModelAdmin):
-    list_display = ('id', 'intern', 'patient', 'room_id', 'start_time', 'end_time')
-    list_filter = ('intern', 'patient')
+    list_display = ('id', 'intern', 'patient', 'room', 'start_time', 'end_time')
+    list_filter = ('intern', 'patient', 'room')
     search_fields = ('intern__first_name', 'intern__last_name', 'patient__first_name', 'patient__last_name')
+
+
+@admin.register(AvailabilityRule)
+class AvailabilityRuleAdmin(admin.ModelAdmin):
+    list_display = ('id', 'intern', 'weekdays', 'start_time', 'end_time', 'start_date', 'end_date', 'turma')
+    list_filter = ('intern',)
+
+
+@admin.register(PatientAvailabilityRule)
+class PatientAvailabilityRuleAdmin(admin.ModelAdmin):
+    list_display = ('id', 'patient', 'weekdays', 'start_time', 'end_time', 'start_date', 'end_date', 'turma')
+    list_filter = ('patient',)
+
+
+@admin.register(FeedToken)
+class FeedTokenAdmin(admin.ModelAdmin):
+    list_display = ('id', 'resource', 'object_id', 'created_by', 'created_at')
+    list_filter = ('resource',)
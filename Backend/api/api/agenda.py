@@ -0,0 +1,138 @@
+"""
+Per-day calendar for the schedules board.
+
+For a range of local days in a given timezone, each day lists its bookings
+(with intern/patient names), the free intern slots and the patient
+availability windows, already grouped and sorted. Everything comes from one
+indexed range query per collection over the days that aren't cached yet;
+computed days are cached one by one, keyed by the response cache counters of
+the UTC days they cover, so a write only invalidates the days it touched.
+"""
+import hashlib
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import serializers
+
+from .fastlist import row_builder
+from .models import PatientAvailability, Schedule
+from .response_cache import TIME_FIELDS, days_between, key_any, key_day, key_undated, read_versions
+from .slots import find_open_slots
+from .sparse import PersonNameSerializer
+
+CACHE_SECONDS = 300
+# changes to these show up on every day (names, active flags, recurring rules and their turma dates)
+UNDATED_DEPENDENCIES = ('estagiario', 'patient', 'turma', 'availabilityrule', 'patientavailabilityrule')
+
+
+class CalendarScheduleSerializer(serializers.ModelSerializer):
+    intern = PersonNameSerializer(read_only=True)
+    patient = PersonNameSerializer(read_only=True)
+    room_id = serializers.PrimaryKeyRelatedField(source='room', read_only=True)
+
+    class Meta:
+        model = Schedule
+        fields = ('id', 'intern', 'patient', 'room_id', 'start_time', 'end_time')
+
+
+class CalendarWindowSerializer(serializers.ModelSerializer):
+    patient = PersonNameSerializer(read_only=True)
+
+    class Meta:
+        model = PatientAvailability
+        fields = ('id', 'patient', 'start_date', 'end_date')
+
+
+def day_bounds(day, tz):
+    start = datetime.combine(day, time.min, tzinfo=tz)
+    return start, datetime.combine(day + timedelta(days=1), time.min, tzinfo=tz)
+
+
+def _rows(queryset, serializer_class, start_field):
+    # yields (raw start, formatted row) in start order
+    columns, build = row_builder(serializer_class())
+    for row in queryset.order_by(start_field, 'id').values(*columns):
+        yield row[start_field], build(row)
+
+
+def compute_days(first_day, last_day, tz, intern=None, patient=None, slot_minutes=60):
+    """Return {date: {'schedules', 'slots', 'patient_windows'}} for first_day..last_day (inclusive)."""
+    start, _ = day_bounds(first_day, tz)
+    _, end = day_bounds(last_day, tz)
+    days = {}
+    for offset in range((last_day - first_day).days + 1):
+        days[first_day + timedelta(days=offset)] = {'schedules': [], 'slots': [], 'patient_windows': []}
+
+    def bucket(value):
+        return days.get(value.astimezone(tz).date())
+
+    schedules = Schedule.objects.filter(start_time__gte=start, start_time__lt=end)
+    windows = PatientAvailability.objects.filter(start_date__gte=start, start_date__lt=end)
+    if intern is not None:
+        schedules = schedules.filter(intern_id=intern)
+    if patient is not None:
+        schedules = schedules.filter(patient_id=patient)
+        windows = windows.filter(patient_id=patient)
+
+    # rows come back sorted, so appending keeps every day sorted
+    for row_start, row in _rows(schedules, CalendarScheduleSerializer, 'start_time'):
+        day = bucket(row_start)
+        if day is not None:
+            day['schedules'].append(row)
+    for row_start, row in _rows(windows, CalendarWindowSerializer, 'start_date'):
+        day = bucket(row_start)
+        if day is not None:
+            day['patient_windows'].append(row)
+    # slots are aligned to local hours, so compute them in the requested timezone, not the server's
+    with timezone.override(tz):
+        slots = find_open_slots(start, end, intern=intern, patient=patient, slot_minutes=slot_minutes)
+    for slot in slots:
+        day = bucket(slot['start'])
+        if day is not None:
+            day['slots'].append(slot)
+    return days
+
+
+def day_keys(wanted, tz, prefix):
+    """{day: cache key} built from the version counters each local day depends on."""
+    shared = [key_any(name) for name in UNDATED_DEPENDENCIES] + [key_undated(name) for name in TIME_FIELDS]
+    per_day = {}
+    for day in wanted:
+        utc_days = days_between(*day_bounds(day, tz))
+        per_day[day] = [key_day(name, utc_day) for name in TIME_FIELDS for utc_day in utc_days]
+    versions = read_versions(shared + [key for keys in per_day.values() for key in keys])
+    keys = {}
+    for day, dependencies in per_day.items():
+        token = '|'.join(str(versions[key]) for key in shared + dependencies)
+        keys[day] = f'{prefix}:{day.isoformat()}:{hashlib.sha1(token.encode()).hexdigest()}'
+    return keys
+
+
+def calendar(first_day, last_day, tz, intern=None, patient=None, slot_minutes=60):
+    """The days first_day..last_day, served from the per-day cache where possible."""
+    wanted = [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+    if not settings.RESPONSE_CACHE:
+        # the day keys hang off the same version counters as the response cache
+        days = compute_days(first_day, last_day, tz, intern, patient, slot_minutes)
+        return [{'date': day.isoformat(), **days[day]} for day in wanted]
+    keys = day_keys(wanted, tz, f'calendar:{tz.key}:{intern}:{patient}:{slot_minutes}')
+    cached = cache.get_many(list(keys.values()))
+    days = {}
+    missing = []
+    for day in wanted:
+        key = keys[day]
+        if key in cached:
+            days[day] = cached[key]
+        else:
+            missing.append(day)
+    if missing:
+        # one pass over the span of the uncached days
+        computed = compute_days(missing[0], missing[-1], tz, intern, patient, slot_minutes)
+        cache.set_many(
+            {keys[day]: computed[day] for day in missing}, CACHE_SECONDS
+        )
+        for day in missing:
+            days[day] = computed[day]
+    return [{'date': day.isoformat(), **days[day]} for day in wanted]
@@ -3,6 +3,11 @@ ASGI config for api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+The live change feed (``/api/live/``) streams over long-lived connections and
+needs this entry point, e.g.::
+
+    gunicorn api.asgi:application -k uvicorn.workers.UvicornWorker
+
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
 """
@@ -0,0 +1,204 @@
+"""
+JWT authentication without loading the user per request.
+
+``CachedJWTAuthentication`` verifies the token as usual and then checks the
+user's authorization state: active/staff/superuser flags, a digest of the
+password hash and the token version. The state is read from the cache when
+every worker shares it (``SHARED_CACHE``, entry dropped whenever the user row
+or the version changes, see signals.py) and with one narrow query otherwise,
+so revokes, deactivation and password changes apply on the next request in
+every process. Requests only skip the database with ``CACHE_BACKEND=redis``
+or ``file``; the per-process default can't tell this worker about changes
+made in another. Only the ``User`` object is kept per process
+(``JWT_USER_CACHE_SECONDS``, default 60), and only while its state matches.
+Tokens carry the version they were issued with (``TOKEN_VERSION_CLAIM``);
+bumping a user's ``TokenVersion`` rejects all of them at once.
+
+``EmailOrUsernameBackend`` finds the user for a login by username or by
+``LOWER(email)`` (indexed, see migration 0014) in a single query.
+"""
+import copy
+import hashlib
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.models.functions import Lower
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .models import FeedToken, TokenVersion
+
+logger = logging.getLogger(__name__)
+
+TOKEN_VERSION_CLAIM = 'ver'
+# accounts sharing an email whose password is tried before giving up
+MAX_EMAIL_MATCHES = 3
+# user columns whose change must reach every process on the next request
+STATE_FIELDS = ('is_active', 'is_staff', 'is_superuser', 'password')
+# users kept per process before the table is emptied
+MAX_LOCAL_USERS = 10000
+
+# user id -> (expires at, state, user)
+_users = {}
+_users_lock = threading.Lock()
+
+
+def _key(user_id):
+    return f'auth:state:{user_id}'
+
+
+def _ttl():
+    return getattr(settings, 'JWT_USER_CACHE_SECONDS', 60)
+
+
+def _state(is_active, is_staff, is_superuser, password, version):
+    # the hash itself stays out of the cache
+    return is_active, is_staff, is_superuser, hashlib.sha256(password.encode()).hexdigest(), version or 0
+
+
+def current_version(user_id):
+    return TokenVersion.objects.filter(user_id=user_id).values_list('version', flat=True).first() or 0
+
+
+def forget_user(user_id):
+    with _users_lock:
+        _users.pop(user_id, None)
+    if settings.SHARED_CACHE:
+        # a marker with the time of the change rather than a delete, so a request that read the
+        # old state just before the commit can't put it back (see load_state)
+        cache.set(_key(user_id), time.time(), _ttl())
+
+
+def revoke_tokens(user):
+    """Invalidate every token issued to ``user`` so far, calendar feed links included; returns the new version."""
+    with transaction.atomic():
+        FeedToken.objects.filter(created_by=user).delete()
+        if not TokenVersion.objects.filter(user=user).update(version=F('version') + 1):
+            TokenVersion.objects.get_or_create(user=user)
+            TokenVersion.objects.filter(user=user).update(version=F('version') + 1)
+        transaction.on_commit(lambda: forget_user(user.pk))
+        return current_version(user.pk)
+
+
+def read_state(user_id):
+    """The authorization state of ``user_id`` from the database (one query), or None."""
+    row = (
+        get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+        .values_list(*STATE_FIELDS, 'token_version__version').first()
+    )
+    return _state(*row) if row is not None else None
+
+
+def load_state(user_id):
+    """The authorization state of ``user_id`` as every process sees it, or None if there is no such user."""
+    if not settings.SHARED_CACHE:
+        # a per-process cache would miss changes made through other workers
+        return read_state(user_id)
+    cached = cache.get(_key(user_id))
+    if isinstance(cached, tuple):
+        return cached
+    started = time.time()
+    state = read_state(user_id)
+    if state is None:
+        return None
+    if cached is None:
+        cache.add(_key(user_id), state, _ttl())
+    elif started > cached + 1:
+        # read well after the last change was committed; one second covers clock skew between workers
+        cache.set(_key(user_id), state, _ttl())
+    return state
+
+
+def load_user(user_id):
+    """(user, state) for ``user_id``, the user from this process while its state is current."""
+    state = load_state(user_id)
+    if state is None:
+        return None
+    now = time.monotonic()
+    entry = _users.get(user_id)
+    if entry is not None and entry[0] > now and entry[1] == state:
+        # requests get their own copy of the shared instance
+        return copy.copy(entry[2]), state
+    user = (
+        get_user_model().objects.filter(**{api_settings.USER_ID_FIELD: user_id})
+        .select_related('token_version').first()
+    )
+    if user is None:
+        return None
+    token_version = getattr(user, 'token_version', None)
+    state = _state(*(getattr(user, name) for name in STATE_FIELDS), token_version.version if token_version else 0)
+    with _users_lock:
+        if len(_users) >= MAX_LOCAL_USERS:
+            _users.clear()
+        _users[user_id] = (now + _ttl(), state, user)
+    return copy.copy(user), state
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError as e:
+            raise InvalidToken(_('Token contained no recognizable user identification')) from e
+
+        entry = load_user(user_id)
+        if entry is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        user, state = entry
+
+        if getattr(api_settings, 'CHECK_USER_IS_ACTIVE', True) and not user.is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        # tokens issued before versions existed count as version 0
+        if validated_token.get(TOKEN_VERSION_CLAIM, 0) != state[-1]:
+            raise AuthenticationFailed(_('Token has been revoked'), code='token_revoked')
+        if getattr(api_settings, 'CHECK_REVOKE_TOKEN', False):
+            # the setting and this helper only exist in newer simplejwt releases
+            from rest_framework_simplejwt.utils import get_md5_hash_password
+            if validated_token.get(api_settings.REVOKE_TOKEN_CLAIM) != get_md5_hash_password(user.password):
+                raise AuthenticationFailed(_("The user's password has been changed."), code='password_changed')
+        return user
+
+
+class EmailOrUsernameBackend(ModelBackend):
+    """
+    ModelBackend that also accepts the email address as the username. Older
+    data has duplicate emails: the password is tried on each match (exact
+    username first, then active and most recently used accounts), up to
+    ``MAX_EMAIL_MATCHES``.
+    """
+
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        User = get_user_model()
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if not username or password is None:
+            return None
+        login = str(username).strip()
+        lookup = Q(**{User.USERNAME_FIELD: login})
+        if '@' in login:
+            lookup |= Q(email_lower=login.lower())
+        candidates = list(
+            User._default_manager.annotate(email_lower=Lower('email')).filter(lookup)
+            .order_by('-is_active', F('last_login').desc(nulls_last=True), 'pk')[:MAX_EMAIL_MATCHES + 1]
+        )
+        if not candidates:
+            # hash anyway so unknown logins take as long as wrong passwords
+            User().set_password(password)
+            return None
+        candidates.sort(key=lambda user: user.get_username() != login)
+        if len(candidates) > 1:
+            logger.warning('login %r matches %d accounts', login, len(candidates))
+        for user in candidates[:MAX_EMAIL_MATCHES]:
+            # check_password rehashes with the preferred hasher when the stored one is outdated
+            if user.check_password(password) and self.user_can_authenticate(user):
+                return user
+        return None
@@ -0,0 +1,247 @@
+"""
+Automatic weekly booking of patients.
+
+Given patients that need N sessions per week, the solver finds the largest
+set of new bookings that respects the interns' free slots (availabilities and
+rules minus bookings), the patients' free windows, the rooms open and free
+at each time (all active rooms unless a list is given) and at most ``max_per_day`` sessions per patient and day. It is a
+maximum flow problem:
+
+    source -> (patient, week) -> (patient, day) -> slot start -> sink
+              cap N - booked     cap per day - booked    1     min(free interns, free rooms)
+
+Interns at the same slot start are interchangeable for the flow, so the graph
+stays small (one node per slot start instead of one per intern and slot), and
+interns and rooms are handed out per slot start afterwards, keeping each
+patient with the intern they see most where possible. The flow uses Dinic's
+algorithm in plain Python and stops at ``time_limit`` with the (still
+conflict-free) bookings found so far.
+"""
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter, deque
+from datetime import datetime, timedelta
+
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Estagiario, Room, Schedule
+from .rooms import free_intervals
+from .slots import find_open_slots, patient_free_windows
+
+
+class MaxFlow:
+    """Dinic's algorithm on adjacency lists; edges are ``[to, residual, reverse index]``."""
+
+    def __init__(self):
+        self.graph = []
+
+    def add_node(self):
+        self.graph.append([])
+        return len(self.graph) - 1
+
+    def add_edge(self, u, v, capacity):
+        edge = [v, capacity, len(self.graph[v])]
+        self.graph[u].append(edge)
+        self.graph[v].append([u, 0, len(self.graph[u]) - 1])
+        return edge
+
+    def _levels(self, source, sink):
+        level = [-1] * len(self.graph)
+        level[source] = 0
+        queue = deque([source])
+        while queue:
+            u = queue.popleft()
+            for v, residual, _ in self.graph[u]:
+                if residual > 0 and level[v] < 0:
+                    level[v] = level[u] + 1
+                    queue.append(v)
+        return level if level[sink] >= 0 else None
+
+    def _push(self, u, sink, limit, level, cursor):
+        # the layered graph is a few levels deep, so recursion stays shallow
+        if u == sink:
+            return limit
+        edges = self.graph[u]
+        while cursor[u] < len(edges):
+            edge = edges[cursor[u]]
+            v, residual, rev = edge
+            if residual > 0 and level[v] == level[u] + 1:
+                pushed = self._push(v, sink, min(limit, residual), level, cursor)
+                if pushed:
+                    edge[1] -= pushed
+                    self.graph[v][rev][1] += pushed
+                    return pushed
+            cursor[u] += 1
+        return 0
+
+    def run(self, source, sink, deadline=None):
+        """Return ``(flow, complete)``; ``complete`` is False when ``deadline`` stopped it early."""
+        flow = 0
+        while True:
+            if deadline is not None and time.monotonic() > deadline:
+                return flow, False
+            level = self._levels(source, sink)
+            if level is None:
+                return flow, True
+            cursor = [0] * len(self.graph)
+            while True:
+                pushed = self._push(source, sink, float('inf'), level, cursor)
+                if not pushed:
+                    break
+                flow += pushed
+                if deadline is not None and time.monotonic() > deadline:
+                    return flow, False
+
+
+def _week(day):
+    return day - timedelta(days=day.weekday())
+
+
+def _free_rooms(rooms, start, end, slot_starts, length):
+    """
+    {slot start: ids of rooms open and unbooked for the whole slot}. ``rooms``
+    limits the active rooms used; None when the clinic has no rooms at all.
+    """
+    queryset = Room.objects.filter(is_active=True).order_by('id')
+    if rooms is not None:
+        queryset = queryset.filter(pk__in=rooms)
+    elif not queryset.exists():
+        return None
+    free = {t: [] for t in slot_starts}
+    for room_id, intervals in sorted(free_intervals(queryset, start, end).items()):
+        for t in _slots_within(intervals, slot_starts, length):
+            free[t].append(room_id)
+    return free
+
+
+def _slots_within(windows, slot_starts, length):
+    # slot starts whose whole slot fits inside one of the (sorted, merged) windows
+    found = []
+    for s, e in windows:
+        i = bisect_left(slot_starts, s)
+        j = bisect_right(slot_starts, e - length)
+        found.extend(slot_starts[i:j])
+    return found
+
+
+def solve(demand, start, end, interns=None, rooms=None, slot_minutes=60, max_per_day=1, time_limit=5.0):
+    """
+    Propose bookings for ``demand`` ({patient_id: sessions per week}) between
+    ``start`` and ``end``. Returns a dict with the proposed ``schedules``
+    (intern, patient, room_id, start_time, end_time), the per-week ``unmet``
+    sessions and whether the search was ``complete``.
+    """
+    deadline = time.monotonic() + time_limit
+    length = timedelta(minutes=slot_minutes)
+
+    # interns free at every slot start
+    slots = find_open_slots(start, end, slot_minutes=slot_minutes)
+    if interns is not None:
+        allowed = set(Estagiario.objects.filter(pk__in=interns, is_active=True).values_list('pk', flat=True))
+        slots = [slot for slot in slots if slot['intern'] in allowed]
+    interns_at = {}
+    for slot in slots:
+        interns_at.setdefault(slot['start'], []).append(slot['intern'])
+    slot_starts = sorted(interns_at)
+    free_rooms = _free_rooms(rooms, start, end, slot_starts, length)
+
+    # sessions already booked count towards the weekly and daily needs
+    first_week = _week(timezone.localtime(start).date())
+    last_week = _week(timezone.localtime(end - timedelta(microseconds=1)).date())
+    booked_week = Counter()
+    booked_day = Counter()
+    history = {}
+    week_start = timezone.make_aware(datetime.combine(first_week, datetime.min.time()))
+    week_end = timezone.make_aware(datetime.combine(last_week + timedelta(days=7), datetime.min.time()))
+    for patient_id, booked_start in Schedule.objects.filter(
+        patient_id__in=list(demand), start_time__gte=week_start, start_time__lt=week_end,
+    ).values_list('patient_id', 'start_time'):
+        day = timezone.localtime(booked_start).date()
+        booked_week[patient_id, _week(day)] += 1
+        booked_day[patient_id, day] += 1
+    for row in (
+        Schedule.objects.filter(patient_id__in=list(demand)).values('patient_id', 'intern_id')
+        .annotate(n=Count('id')).order_by('patient_id', '-n', 'intern_id')
+    ):
+        history.setdefault(row['patient_id'], row['intern_id'])
+
+    graph = MaxFlow()
+    source, sink = graph.add_node(), graph.add_node()
+    slot_node = {}
+    for t in slot_starts:
+        capacity = len(interns_at[t])
+        if free_rooms is not None:
+            capacity = min(capacity, len(free_rooms[t]))
+        if capacity:
+            slot_node[t] = graph.add_node()
+            graph.add_edge(slot_node[t], sink, capacity)
+
+    windows = patient_free_windows(list(demand), start, end)
+    week_need = {}
+    choices = []
+    for patient_id, per_week in demand.items():
+        by_day = {}
+        for t in _slots_within(windows.get(patient_id, ()), slot_starts, length):
+            if t in slot_node:
+                by_day.setdefault(timezone.localtime(t).date(), []).append(t)
+        for week in (first_week + timedelta(days=7 * n) for n in range((last_week - first_week).days // 7 + 1)):
+            need = per_week - booked_week[patient_id, week]
+            week_need[patient_id, week] = max(need, 0)
+            if need <= 0:
+                continue
+            week_node = None
+            for day in (week + timedelta(days=n) for n in range(7)):
+                room_left = max_per_day - booked_day[patient_id, day]
+                if room_left <= 0 or day not in by_day:
+                    continue
+                if week_node is None:
+                    week_node = graph.add_node()
+                    graph.add_edge(source, week_node, need)
+                day_node = graph.add_node()
+                graph.add_edge(week_node, day_node, room_left)
+                # slots where the usual intern is free come first
+                preferred = history.get(patient_id)
+                for t in sorted(by_day[day], key=lambda t: (preferred not in interns_at[t], t)):
+                    choices.append((patient_id, t, graph.add_edge(day_node, slot_node[t], 1)))
+
+    _, complete = graph.run(source, sink, deadline)
+
+    # hand out interns and rooms per slot start, usual intern first, then the least loaded
+    chosen = {}
+    for patient_id, t, edge in choices:
+        if edge[1] == 0:
+            chosen.setdefault(t, []).append(patient_id)
+    load = Counter()
+    schedules = []
+    unmet = Counter(week_need)
+    for t in sorted(chosen):
+        available = set(interns_at[t])
+        rooms_left = list(free_rooms[t]) if free_rooms is not None else None
+        patients = sorted(chosen[t], key=lambda p: (history.get(p) not in available, p))
+        for patient_id in patients:
+            intern_id = history.get(patient_id)
+            if intern_id not in available:
+                intern_id = min(available, key=lambda i: (load[i], i))
+                history[patient_id] = intern_id
+            available.discard(intern_id)
+            load[intern_id] += 1
+            unmet[patient_id, _week(timezone.localtime(t).date())] -= 1
+            schedules.append({
+                'intern': intern_id,
+                'patient': patient_id,
+                'room_id': rooms_left.pop(0) if rooms_left is not None else None,
+                'start_time': t,
+                'end_time': t + length,
+            })
+    schedules.sort(key=lambda row: (row['start_time'], row['patient']))
+    return {
+        'complete': complete,
+        'requested': sum(week_need.values()),
+        'scheduled': len(schedules),
+        'unmet': [
+            {'patient': patient_id, 'week': week.isoformat(), 'missing': missing}
+            for (patient_id, week), missing in sorted(unmet.items()) if missing > 0
+        ],
+        'schedules': schedules,
+    }
@@ -0,0 +1,82 @@
+"""
+Race-free booking writes.
+
+The overlap check in ``ScheduleSerializer`` (``overlapping_bookings``, a
+range query on the (resource, start_time) indexes) and the batch sweep of bulk
+writes read before they write, so two workers booking the same slot could both
+pass them. On PostgreSQL the exclusion constraints of migration 0015 reject the
+second insert; on SQLite ``booking_transaction`` takes the database write lock
+before the check, so concurrent checks and inserts run one after another.
+Either way the loser gets a 409 ``BookingConflict``.
+"""
+from contextlib import contextmanager
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Q
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import Schedule
+
+# SQLSTATE of an EXCLUDE constraint violation
+EXCLUSION_VIOLATION = '23P01'
+CONSTRAINTS = {
+    'api_sched_intern_no_overlap': 'intern',
+    'api_sched_patient_no_overlap': 'patient',
+    'api_sched_room_no_overlap': 'room',
+}
+
+
+class BookingConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'The booking overlaps another one.'
+    default_code = 'conflict'
+
+
+def overlapping_bookings(start, end, intern=None, patient=None, room=None, exclude=None):
+    """
+    Map each of the given resources to the ids of its bookings overlapping
+    [start, end), read from the database rather than the in-memory index so
+    the answer is exact inside ``booking_transaction``.
+    """
+    wanted = {'intern': intern, 'patient': patient, 'room': room}
+    lookup = Q()
+    for resource, resource_id in wanted.items():
+        if resource_id is not None:
+            lookup |= Q(**{f'{resource}_id': resource_id})
+    if not lookup:
+        return {}
+    rows = (
+        Schedule.objects.filter(lookup, start_time__lt=end, end_time__gt=start)
+        .exclude(pk=exclude).order_by('pk').values_list('pk', 'intern_id', 'patient_id', 'room_id')
+    )
+    result = {}
+    for pk, *owners in rows:
+        for (resource, resource_id), owner in zip(wanted.items(), owners):
+            if resource_id is not None and owner == resource_id:
+                result.setdefault(resource, []).append(pk)
+    return result
+
+
+def _sqlstate(error):
+    cause = error.__cause__
+    # psycopg 3 / psycopg2
+    return getattr(cause, 'sqlstate', None) or getattr(cause, 'pgcode', None)
+
+
+@contextmanager
+def booking_transaction():
+    """Atomic block for validating and writing bookings; overlaps found by the database become 409s."""
+    try:
+        with transaction.atomic():
+            if connection.vendor == 'sqlite':
+                # a write statement takes the write lock now, before anything is read, so other
+                # processes' bookings are either committed already or wait for this one
+                with connection.cursor() as cursor:
+                    cursor.execute('UPDATE api_schedule SET id = id WHERE 0')
+            yield
+    except IntegrityError as e:
+        if _sqlstate(e) != EXCLUSION_VIOLATION:
+            raise
+        resource = next((name for constraint, name in CONSTRAINTS.items() if constraint in str(e)), 'resource')
+        raise BookingConflict({'non_field_errors': [f'{resource} already booked in this period']}) from e
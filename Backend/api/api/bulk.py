@@ -0,0 +1,230 @@
+"""
+List-accepting bulk endpoints for the time-based resources.
+
+``POST``/``PATCH``/``DELETE`` on ``<resource>/bulk/`` validate the whole batch
+(one query per related model instead of one per row), check overlaps of the
+batch against itself and the existing rows in one sorted sweep, and write
+everything with ``bulk_create``/``bulk_update`` inside a single transaction.
+Either every row is written or none is; errors are reported per row, in
+input order.
+"""
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.response import Response
+
+from .booking import BookingConflict
+from .search import build_document
+from .signals import bulk_deleted, bulk_saved
+
+MAX_BULK_ROWS = 10000
+
+
+def find_overlaps(intervals):
+    """
+    ``intervals`` are (start, end, tag) tuples on a single resource; return
+    (tag, other_tag) pairs where the first interval overlaps an earlier one.
+    """
+    found = []
+    latest = None
+    for start, end, tag in sorted(intervals, key=lambda i: (i[0], i[1])):
+        if latest is not None and start < latest[0]:
+            found.append((tag, latest[1]))
+        if latest is None or end > latest[0]:
+            latest = (end, tag)
+    return found
+
+
+class BulkModelMixin:
+    """
+    Adds ``bulk`` to a ModelViewSet. Subclasses set ``bulk_time_fields`` and
+    ``bulk_overlap_fields`` (FK/column names whose bookings must not overlap).
+    """
+    bulk_time_fields = ('start_date', 'end_date')
+    bulk_overlap_fields = ()
+    bulk_select_related = ()
+
+    def write_transaction(self):
+        # wraps validation and writes of a batch, so overlap checks see what they are checked against
+        return transaction.atomic()
+
+    def _bulk_rows(self, request):
+        rows = request.data
+        if not isinstance(rows, list):
+            raise ValidationError({'detail': 'expected a JSON list of rows'})
+        if len(rows) > MAX_BULK_ROWS:
+            raise ValidationError({'detail': f'at most {MAX_BULK_ROWS} rows per request'})
+        return rows
+
+    def _prefetch_related(self, rows):
+        # one query per FK instead of one per row
+        prefetched = {}
+        serializer = self.get_serializer()
+        for name, field in serializer.fields.items():
+            queryset = getattr(field, 'queryset', None)
+            if queryset is None or field.read_only:
+                continue
+            ids = set()
+            for row in rows:
+                try:
+                    ids.add(int(row.get(name)))
+                except (AttributeError, TypeError, ValueError):
+                    pass
+            prefetched[queryset.model] = queryset.in_bulk(ids) if ids else {}
+        return prefetched
+
+    def _overlap_errors(self, candidates, ignore_ids):
+        """
+        ``candidates`` maps row index -> unsaved/updated instance. Existing rows are
+        loaded with one range query; rows in ``ignore_ids`` are being replaced.
+        """
+        if not self.bulk_overlap_fields or not candidates:
+            return {}
+        model = self.queryset.model
+        start_field, end_field = self.bulk_time_fields
+        attnames = [model._meta.get_field(f).attname for f in self.bulk_overlap_fields]
+        lo = min(getattr(obj, start_field) for obj in candidates.values())
+        hi = max(getattr(obj, end_field) for obj in candidates.values())
+        by_resource = Q()
+        for attname in attnames:
+            values = {getattr(obj, attname) for obj in candidates.values()} - {None}
+            if values:
+                by_resource |= Q(**{f'{attname}__in': values})
+        existing = (
+            model.objects.filter(by_resource, **{f'{start_field}__lt': hi, f'{end_field}__gt': lo})
+            .exclude(pk__in=ignore_ids)
+            .values_list('pk', start_field, end_field, *attnames)
+        )
+        groups = {}
+        for pk, start, end, *keys in existing:
+            for attname, key in zip(attnames, keys):
+                if key is not None:
+                    groups.setdefault((attname, key), []).append((start, end, ('row', pk)))
+        for index, obj in candidates.items():
+            for attname in attnames:
+                key = getattr(obj, attname)
+                if key is not None:
+                    groups.setdefault((attname, key), []).append(
+                        (getattr(obj, start_field), getattr(obj, end_field), ('batch', index))
+                    )
+        errors = {}
+        for (attname, _), intervals in groups.items():
+            resource = attname[:-3] if attname.endswith('_id') else attname
+            for tag, other in find_overlaps(intervals):
+                # report on the batch row; if only the other one is new, flip the pair
+                if tag[0] != 'batch':
+                    tag, other = other, tag
+                if tag[0] != 'batch':
+                    continue
+                where = f'row {other[1]} of this batch' if other[0] == 'batch' else f'existing id {other[1]}'
+                errors.setdefault(tag[1], []).append(f'{resource} overlaps {where}')
+        return errors
+
+    def _validate_batch(self, rows, instances=None, partial=False):
+        context = {**self.get_serializer_context(), 'bulk': True, 'prefetched': self._prefetch_related(rows)}
+        serializer_cls = self.get_serializer_class()
+        errors = [{} for _ in rows]
+        validated = {}
+        start_field, end_field = self.bulk_time_fields
+        for index, row in enumerate(rows):
+            instance = instances[index] if instances is not None else None
+            if instances is not None and instance is None:
+                errors[index] = {'id': ['not found']}
+                continue
+            serializer = serializer_cls(instance, data=row, partial=partial, context=context)
+            if not serializer.is_valid():
+                errors[index] = serializer.errors
+                continue
+            attrs = serializer.validated_data
+            obj = instance or serializer_cls.Meta.model()
+            for attr, value in attrs.items():
+                setattr(obj, attr, value)
+            if getattr(obj, end_field) <= getattr(obj, start_field):
+                errors[index] = {end_field: [f'{end_field} must be after {start_field}']}
+                continue
+            validated[index] = (obj, list(attrs))
+        ignore_ids = [obj.pk for obj, _ in validated.values() if obj.pk is not None]
+        overlaps = self._overlap_errors({i: obj for i, (obj, _) in validated.items()}, ignore_ids)
+        invalid = any(errors)
+        for index, messages in overlaps.items():
+            errors[index] = {'non_field_errors': messages}
+        if invalid:
+            raise ValidationError({'errors': errors})
+        if overlaps:
+            # valid rows that clash with bookings are a conflict, not bad input
+            raise BookingConflict({'errors': errors})
+        return [validated[i] for i in range(len(rows))]
+
+    def bulk_finalize(self, objs):
+        # runs inside the write transaction; returns the rows to respond with
+        return objs
+
+    def _prepare(self, objs):
+        model = self.queryset.model
+        if model._meta.model_name == 'schedule':
+            # bulk_create skips the pre_save signal that fills this in
+            for obj in objs:
+                obj.search_document = build_document(obj)
+
+    def bulk_create_rows(self, rows):
+        # validate and insert ``rows`` (dicts in the serializer's input format) all or nothing
+        model = self.queryset.model
+        with self.write_transaction():
+            validated = self._validate_batch(rows)
+            objs = [obj for obj, _ in validated]
+            self._prepare(objs)
+            created = model.objects.bulk_create(objs, batch_size=1000)
+            bulk_saved(model, created)
+            return self.bulk_finalize(created)
+
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request):
+        model = self.queryset.model
+        rows = self._bulk_rows(request)
+
+        if request.method == 'DELETE':
+            try:
+                ids = [int(pk) for pk in rows]
+            except (TypeError, ValueError):
+                raise ValidationError({'detail': 'expected a list of ids'})
+            with transaction.atomic():
+                found = list(model.objects.filter(pk__in=ids).values_list('pk', flat=True))
+                model.objects.filter(pk__in=found)._raw_delete(model.objects.db)
+                bulk_deleted(model, found)
+            return Response({'deleted': len(found)}, status=status.HTTP_200_OK)
+
+        if request.method == 'PATCH':
+            ids = []
+            for row in rows:
+                try:
+                    ids.append(int(row['id']))
+                except (KeyError, TypeError, ValueError):
+                    ids.append(None)
+            with self.write_transaction():
+                existing = model.objects.select_related(*self.bulk_select_related).in_bulk(
+                    [pk for pk in ids if pk is not None]
+                )
+                instances = [existing.get(pk) for pk in ids]
+                validated = self._validate_batch(rows, instances, partial=True)
+                objs = [obj for obj, _ in validated]
+                fields = sorted({f for _, attrs in validated for f in attrs})
+                self._prepare(objs)
+                if model._meta.model_name == 'schedule':
+                    fields.append('search_document')
+                if fields:
+                    # bulk_update skips auto_now
+                    now = timezone.now()
+                    for obj in objs:
+                        obj.updated_at = now
+                    fields.append('updated_at')
+                if fields:
+                    model.objects.bulk_update(objs, fields, batch_size=1000)
+                bulk_saved(model, objs)
+                objs = self.bulk_finalize(objs)
+            return Response(self.get_serializer(objs, many=True).data)
+
+        created = self.bulk_create_rows(rows)
+        return Response(self.get_serializer(created, many=True).data, status=status.HTTP_201_CREATED)
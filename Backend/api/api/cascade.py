@@ -0,0 +1,117 @@
+"""
+Soft-delete cascade for patients and interns.
+
+Deactivating a person flips ``is_active`` and removes their future
+availabilities and bookings. The rows are deleted with raw range deletes (no
+cascade collector, nothing loaded into memory but the ids), journaled in bulk.
+Small cascades run inside the request's transaction; large ones are handed to
+a ``CascadeJob`` that deletes in chunks on a background thread and reports its
+progress.
+"""
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.utils import timezone
+
+from . import journal
+from .models import Availability, CascadeJob, Estagiario, Patient, PatientAvailability, Schedule
+from .signals import bulk_deleted
+
+CHUNK_SIZE = 1000
+BACKGROUND_THRESHOLD = getattr(settings, 'CASCADE_BACKGROUND_THRESHOLD', 5000)
+
+PEOPLE = {
+    'patient': Patient,
+    'estagiario': Estagiario,
+}
+
+
+def targets(person, cutoff):
+    """(model, queryset) pairs of the rows removed when ``person`` is deactivated."""
+    if isinstance(person, Patient):
+        return [
+            (PatientAvailability, PatientAvailability.objects.filter(patient_id=person.pk, start_date__gt=cutoff)),
+            (Schedule, Schedule.objects.filter(patient_id=person.pk, start_time__gt=cutoff)),
+        ]
+    return [
+        (Availability, Availability.objects.filter(intern_id=person.pk, start_date__gt=cutoff)),
+        (Schedule, Schedule.objects.filter(intern_id=person.pk, start_time__gt=cutoff)),
+    ]
+
+
+def count_targets(person, cutoff):
+    return sum(qs.count() for _, qs in targets(person, cutoff))
+
+
+def delete_chunk(model, queryset, limit=CHUNK_SIZE):
+    """Delete up to ``limit`` rows of ``queryset``, bypassing the collector; return how many."""
+    ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:limit])
+    if ids:
+        model.objects.filter(pk__in=ids)._raw_delete(model.objects.db)
+        bulk_deleted(model, ids)
+    return len(ids)
+
+
+def _deactivate(person):
+    person.is_active = False
+    person.save(update_fields=['is_active', 'updated_at'])
+
+
+def deactivate(person, cutoff=None):
+    """Deactivate ``person`` and remove their future rows in one transaction; return the count."""
+    cutoff = cutoff or timezone.now()
+    removed = 0
+    with transaction.atomic(), journal.batch():
+        _deactivate(person)
+        for model, queryset in targets(person, cutoff):
+            while True:
+                deleted = delete_chunk(model, queryset)
+                removed += deleted
+                if deleted < CHUNK_SIZE:
+                    break
+    return removed
+
+
+def start_job(person, cutoff=None, total=None):
+    """Deactivate ``person`` now and queue the removal of their future rows."""
+    cutoff = cutoff or timezone.now()
+    with transaction.atomic():
+        _deactivate(person)
+        job = CascadeJob.objects.create(
+            model=person._meta.model_name,
+            object_id=person.pk,
+            cutoff=cutoff,
+            total=total if total is not None else count_targets(person, cutoff),
+        )
+        transaction.on_commit(lambda: threading.Thread(target=_run_in_thread, args=(job.pk,), daemon=True).start())
+    return job
+
+
+def _run_in_thread(job_id):
+    try:
+        run_job(CascadeJob.objects.get(pk=job_id))
+    finally:
+        close_old_connections()
+
+
+def run_job(job):
+    """Work through a job chunk by chunk; each chunk commits on its own, so a job can be resumed."""
+    person = PEOPLE[job.model](pk=job.object_id)
+    CascadeJob.objects.filter(pk=job.pk).update(status=CascadeJob.RUNNING)
+    try:
+        for model, queryset in targets(person, job.cutoff):
+            while True:
+                with transaction.atomic(), journal.batch():
+                    deleted = delete_chunk(model, queryset)
+                    job.done += deleted
+                    CascadeJob.objects.filter(pk=job.pk).update(done=job.done)
+                if deleted < CHUNK_SIZE:
+                    break
+    except Exception as e:
+        CascadeJob.objects.filter(pk=job.pk).update(status=CascadeJob.FAILED, error=str(e), finished_at=timezone.now())
+        raise
+    # rows booked in the meantime may push `done` past the initial estimate
+    CascadeJob.objects.filter(pk=job.pk).update(
+        status=CascadeJob.DONE, total=max(job.total, job.done), finished_at=timezone.now()
+    )
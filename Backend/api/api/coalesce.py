@@ -0,0 +1,157 @@
+"""
+Normalization of availability intervals.
+
+An intern's (or patient's) availability is kept as a set of disjoint,
+non-touching intervals: whenever rows overlap or meet end-to-start they are
+merged into the earliest one and the rest are deleted. Writes through the API
+coalesce the affected owner around the written range; the
+``coalesce_availabilities`` management command backfills existing data.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Availability, PatientAvailability
+from .signals import bulk_deleted, bulk_saved
+
+OWNER_FIELDS = {
+    Availability: 'intern_id',
+    PatientAvailability: 'patient_id',
+}
+
+
+def merge_rows(rows):
+    """
+    ``rows`` are (pk, start, end) tuples of one owner sorted by start; return
+    [survivor_pk, start, end, absorbed_pks] groups of touching intervals.
+    """
+    groups = []
+    for pk, start, end in rows:
+        if groups and start <= groups[-1][2]:
+            group = groups[-1]
+            if end > group[2]:
+                group[2] = end
+            group[3].append(pk)
+        else:
+            groups.append([pk, start, end, []])
+    return groups
+
+
+def _load(model, owner_ids, start, end):
+    owner = OWNER_FIELDS[model]
+    qs = model.objects.all()
+    if owner_ids is not None:
+        qs = qs.filter(**{f'{owner}__in': owner_ids})
+    if start is not None:
+        # end == start still touches, so the bounds are inclusive
+        qs = qs.filter(end_date__gte=start, start_date__lte=end)
+    rows = {}
+    for owner_id, pk, row_start, row_end in (
+        qs.order_by(owner, 'start_date', 'id').values_list(owner, 'pk', 'start_date', 'end_date').iterator()
+    ):
+        rows.setdefault(owner_id, []).append((pk, row_start, row_end))
+    return rows
+
+
+def coalesce(model, owner_ids=None, start=None, end=None, dry_run=False):
+    """
+    Merge overlapping and adjacent rows of ``model`` per owner.
+
+    With ``start``/``end`` only rows touching that range (and whatever they in
+    turn touch) are considered. Returns ``(survivors, collapsed)``: a map from
+    every absorbed pk to the pk it was merged into, and the number of rows
+    deleted.
+    """
+    with transaction.atomic():
+        while True:
+            by_owner = _load(model, owner_ids, start, end)
+            groups = [g for rows in by_owner.values() for g in merge_rows(rows)]
+            if start is None:
+                break
+            # a merged interval may reach rows outside the range we loaded
+            lo = min((g[1] for g in groups), default=start)
+            hi = max((g[2] for g in groups), default=end)
+            if lo >= start and hi <= end:
+                break
+            start, end = min(lo, start), max(hi, end)
+
+        survivors = {}
+        changed = []
+        absorbed = []
+        now = timezone.now()
+        for pk, _, group_end, others in groups:
+            if not others:
+                continue
+            for other in others:
+                survivors[other] = pk
+            absorbed.extend(others)
+            changed.append(model(pk=pk, end_date=group_end, updated_at=now))
+        if dry_run or not absorbed:
+            return survivors, len(absorbed)
+
+        # the survivor is the earliest row, so only its end moves
+        model.objects.bulk_update(changed, ['end_date', 'updated_at'], batch_size=1000)
+        for offset in range(0, len(absorbed), 1000):
+            model.objects.filter(pk__in=absorbed[offset:offset + 1000])._raw_delete(model.objects.db)
+        bulk_saved(model, changed)
+        bulk_deleted(model, absorbed)
+    return survivors, len(absorbed)
+
+
+def coalesce_instances(model, objs):
+    """
+    Coalesce around freshly written ``objs`` and return the canonical rows that
+    now cover them (in input order, without duplicates) and the collapsed count.
+    """
+    objs = list(objs)
+    if not objs:
+        return [], 0
+    owner = OWNER_FIELDS[model]
+    survivors, collapsed = coalesce(
+        model,
+        owner_ids={getattr(obj, owner) for obj in objs},
+        start=min(obj.start_date for obj in objs),
+        end=max(obj.end_date for obj in objs),
+    )
+    ids = []
+    for obj in objs:
+        pk = obj.pk
+        while pk in survivors:
+            pk = survivors[pk]
+        if pk not in ids:
+            ids.append(pk)
+    rows = model.objects.in_bulk(ids)
+    return [rows[pk] for pk in ids if pk in rows], collapsed
+
+
+class CoalescingMixin:
+    """
+    For the availability viewsets: every create/update (single or bulk) is
+    followed by a coalesce of the owner around the written range. The response
+    carries the canonical row(s) and ``X-Coalesced-Rows`` with the number of
+    rows that were merged away.
+    """
+    collapsed = 0
+
+    def _coalesce(self, serializer):
+        rows, self.collapsed = coalesce_instances(self.queryset.model, [serializer.instance])
+        serializer.instance = rows[0]
+
+    def perform_create(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+            self._coalesce(serializer)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+            self._coalesce(serializer)
+
+    def bulk_finalize(self, objs):
+        rows, self.collapsed = coalesce_instances(self.queryset.model, objs)
+        return rows
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if self.collapsed:
+            response['X-Coalesced-Rows'] = str(self.collapsed)
+        return response
@@ -0,0 +1,106 @@
+"""
+Conditional GET from row modification times.
+
+Before serializing, ``list`` and ``retrieve`` run one aggregate over the
+filtered queryset, ``Max(updated_at)`` and ``Count``, and derive the
+``ETag`` and ``Last-Modified`` headers from it: edits and inserts move the
+maximum, deletes the count. A matching ``If-None-Match`` (or, for a single
+row, ``If-Modified-Since``) is answered with an empty 304, so polling an
+unchanged list costs that one query. Related rows shown in the response
+(``cache_depends_on``: embedded names, search) don't move ``updated_at``;
+their response cache counters are folded into the ETag instead when the cache
+is shared between workers (``SHARED_CACHE``), and otherwise one
+``Max(updated_at)``/``Count`` aggregate per related model.
+"""
+import hashlib
+
+from django.apps import apps
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Count, Max
+from django.http import Http404
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.response import Response
+
+from .response_cache import key_any, read_versions
+
+
+def _etags(header):
+    return {tag.strip() for tag in header.split(',') if tag.strip()}
+
+
+def dependency_parts(names):
+    """Validator parts that change with the rows of the models ``names``."""
+    if settings.SHARED_CACHE:
+        return list(map(str, read_versions([key_any(name) for name in names]).values()))
+    # a per-process counter only moves in the worker that made the change; ask the rows
+    parts = []
+    for name in names:
+        state = apps.get_model('api', name).objects.aggregate(last=Max('updated_at'), count=Count('pk'))
+        parts.extend([str(state['count']), state['last'].isoformat() if state['last'] else ''])
+    return parts
+
+
+class ConditionalGetMixin:
+    """Viewset mixin for models with an ``updated_at`` column."""
+    # tells CachedResponseMixin to leave the validators to this mixin
+    row_validators = True
+
+    def conditional_queryset(self):
+        queryset = self.filter_queryset(self.get_queryset())
+        if self.action == 'retrieve':
+            lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+            try:
+                queryset = queryset.filter(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+            except (TypeError, ValueError, ValidationError):
+                # a malformed id is a missing row, as in get_object()
+                raise Http404
+        return queryset.order_by()
+
+    def validators(self, request):
+        """(etag, last_modified timestamp or None, row count) for the current request."""
+        state = self.conditional_queryset().aggregate(last=Max('updated_at'), count=Count('pk'))
+        last = state['last']
+        parts = [
+            self.action, str(state['count']), last.isoformat() if last else '',
+            getattr(request, 'accepted_media_type', '') or '',
+        ]
+        depends_on = getattr(self, 'cache_depends_on', ())
+        if depends_on:
+            parts.extend(dependency_parts(depends_on))
+        etag = f'"{hashlib.sha1("|".join(parts).encode()).hexdigest()}"'
+        return etag, int(last.timestamp()) if last else None, state['count']
+
+    def _conditional(self, request, produce):
+        if request.method != 'GET':
+            return produce()
+        etag, last_modified, count = self.validators(request)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache'}
+        if last_modified is not None:
+            headers['Last-Modified'] = http_date(last_modified)
+
+        not_modified = False
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            tags = _etags(if_none_match)
+            not_modified = etag in tags or ('*' in tags and count > 0)
+        elif self.action == 'retrieve' and last_modified is not None and not getattr(self, 'cache_depends_on', ()):
+            # deletes don't move Max(updated_at), so lists only trust the ETag
+            since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+            not_modified = since is not None and last_modified <= since
+        if not_modified:
+            return Response(status=304, headers=headers)
+
+        # part of the response cache key, so a body cached under older rows is never sent with this ETag
+        self.row_etag = etag
+        response = produce()
+        if response.status_code == 200:
+            for name, value in headers.items():
+                response[name] = value
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(request, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(request, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs))
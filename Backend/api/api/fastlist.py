@@ -0,0 +1,149 @@
+"""
+Read-optimized list path.
+
+For serializers made only of plain columns (ids, foreign key ids, text,
+numbers, booleans, ISO dates and datetimes) the list action fetches
+``.values()`` rows and formats them with per-field functions prepared once
+per request, instead of instantiating a model and running every field's
+``to_representation`` for every row. The produced data is identical to what
+the serializer would return; serializers with anything else fall back to the
+regular path. Turn it off with ``FAST_LIST_SERIALIZATION=0``.
+"""
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+# passed through untouched: the database driver already returns the representation
+PLAIN_FIELDS = (
+    serializers.BooleanField,
+    serializers.CharField,
+)
+
+
+def _datetime_formatter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601 or hasattr(field, 'timezone'):
+        return None
+    tz = field.default_timezone()
+    if tz is None:
+        return None
+
+    def fmt(value):
+        # same as DateTimeField.enforce_timezone + to_representation for aware values
+        if value.tzinfo is None:
+            value = timezone.make_aware(value, tz)
+        else:
+            value = value.astimezone(tz)
+        text = value.isoformat()
+        if text.endswith('+00:00'):
+            text = text[:-6] + 'Z'
+        return text
+    return fmt
+
+
+def _date_formatter(field):
+    output_format = getattr(field, 'format', api_settings.DATE_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return None
+    return lambda value: value.isoformat()
+
+
+def _formatter(field):
+    """Return (supported, fmt) where fmt is None for values used as they are."""
+    if isinstance(field, serializers.PrimaryKeyRelatedField):
+        return field.pk_field is None, None
+    if isinstance(field, serializers.IntegerField):
+        # BigIntegerField may be told to render as a string
+        return not getattr(field, 'coerce_to_string', False), None
+    if isinstance(field, serializers.DateTimeField):
+        fmt = _datetime_formatter(field)
+        return fmt is not None, fmt
+    if isinstance(field, serializers.DateField):
+        fmt = _date_formatter(field)
+        return fmt is not None, fmt
+    if type(field).to_representation in {cls.to_representation for cls in PLAIN_FIELDS}:
+        return True, None
+    return False, None
+
+
+def _plan(serializer, prefix=''):
+    """[(name, column, fmt or nested plan)] for ``serializer``, or None if unsupported."""
+    plan = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if field.source in ('*', '') or '.' in field.source:
+            return None
+        column = prefix + field.source
+        if isinstance(field, serializers.Serializer):
+            # embedded object (e.g. ?expand=intern) read through the join
+            nested = _plan(field, column + '__')
+            if nested is None:
+                return None
+            plan.append((name, column, nested))
+            continue
+        supported, fmt = _formatter(field)
+        if not supported:
+            return None
+        plan.append((name, column, fmt))
+    return plan
+
+
+def _columns(plan):
+    for _, column, fmt in plan:
+        if isinstance(fmt, list):
+            # the relation's own column tells a missing related row apart
+            yield column
+            yield from _columns(fmt)
+        else:
+            yield column
+
+
+def _build(plan, row):
+    data = {}
+    for name, column, fmt in plan:
+        value = row[column]
+        if value is None or fmt is None:
+            data[name] = value
+        elif isinstance(fmt, list):
+            data[name] = _build(fmt, row)
+        else:
+            data[name] = fmt(value)
+    return data
+
+
+def row_builder(serializer):
+    """
+    Return ``(columns, build)`` for ``serializer`` where ``build(row)`` turns a
+    ``.values(*columns)`` dict into the serializer's output, or None when some
+    field can't be produced from a column.
+    """
+    plan = _plan(serializer)
+    if plan is None:
+        return None
+    columns = list(dict.fromkeys(_columns(plan)))
+    return columns, lambda row: _build(plan, row)
+
+
+class FastListMixin:
+    """``list()`` through ``row_builder`` when the serializer allows it."""
+
+    def list(self, request, *args, **kwargs):
+        builder = None
+        if getattr(settings, 'FAST_LIST_SERIALIZATION', True):
+            builder = row_builder(self.get_serializer())
+        if builder is None:
+            return super().list(request, *args, **kwargs)
+        columns, build = builder
+        # cursor pagination reads its position from the rows, even if ?fields= left it out
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        columns = list(dict.fromkeys([*columns, *(field.lstrip('-') for field in ordering)]))
+        queryset = self.filter_queryset(self.get_queryset()).values(*columns)
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response([build(row) for row in page])
+        return Response([build(row) for row in queryset])
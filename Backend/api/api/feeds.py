@@ -0,0 +1,191 @@
+"""
+iCalendar feeds of bookings.
+
+``GET /api/feeds/<token>.ics`` serves the bookings of the intern, patient or
+room a ``FeedToken`` points at; the secret token in the URL is the only
+credential, so calendar apps can subscribe to it; tokens of deactivated users
+stop working. The events are streamed from a ``.iterator()`` queryset under
+WSGI and from keyset-paginated chunks fetched with ``sync_to_async`` under
+ASGI (which would otherwise buffer a sync iterator whole), so memory stays
+flat however long the history. Before streaming, one aggregate
+(``Max(updated_at)``, ``Count``) over the window plus the state of the people
+and rooms named in the events (``conditional.dependency_parts``) give the
+``ETag``; a poll of an unchanged feed is a 304.
+"""
+import hashlib
+from datetime import timedelta, timezone as dt_timezone
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import Count, Max, Q
+from django.http import HttpResponse, HttpResponseNotModified, JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.http import http_date
+from django.views.decorators.http import require_GET
+
+from .conditional import dependency_parts
+from .models import Estagiario, FeedToken, Patient, Room, Schedule
+from .slots import parse_bound
+
+# columns read per event
+COLUMNS = (
+    'pk', 'start_time', 'end_time', 'updated_at', 'intern__first_name', 'intern__last_name',
+    'patient__first_name', 'patient__last_name', 'room__name',
+)
+# whose names appear in the events
+NAME_DEPENDENCIES = ('estagiario', 'patient', 'room')
+RESOURCE_MODELS = {FeedToken.INTERN: Estagiario, FeedToken.PATIENT: Patient, FeedToken.ROOM: Room}
+CHUNK_SIZE = 2000
+
+
+def escape(text):
+    return text.replace('\\', '\\\\').replace(';', '\\;').replace(',', '\\,').replace('\n', '\\n')
+
+
+def fold(line):
+    # content lines are limited to 75 octets; continuations start with a space
+    data = line.encode()
+    if len(data) <= 75:
+        return line + '\r\n'
+    parts = []
+    while data:
+        limit = 75 if not parts else 74
+        cut = min(limit, len(data))
+        # don't split a UTF-8 sequence
+        while cut < len(data) and (data[cut] & 0xC0) == 0x80:
+            cut -= 1
+        parts.append(data[:cut].decode())
+        data = data[cut:]
+    return '\r\n '.join(parts) + '\r\n'
+
+
+def _stamp(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+def _name(first, last):
+    return f'{first} {last}' if last else (first or '')
+
+
+def feed_title(feed):
+    owner = RESOURCE_MODELS[feed.resource].objects.filter(pk=feed.object_id).first()
+    return str(owner) if owner is not None else f'{feed.get_resource_display()} {feed.object_id}'
+
+
+def feed_queryset(feed, start, end):
+    queryset = Schedule.objects.filter(**{f'{feed.resource}_id': feed.object_id})
+    if start is not None:
+        queryset = queryset.filter(end_time__gt=start)
+    if end is not None:
+        queryset = queryset.filter(start_time__lt=end)
+    return queryset
+
+
+def _header(feed):
+    return ''.join([
+        fold('BEGIN:VCALENDAR'),
+        fold('VERSION:2.0'),
+        fold('PRODID:-//MyPsi//Schedules//EN'),
+        fold('CALSCALE:GREGORIAN'),
+        fold(f'X-WR-CALNAME:{escape(feed_title(feed))}'),
+    ])
+
+
+def _event(feed, row, host):
+    pk, start, end, updated, intern_first, intern_last, patient_first, patient_last, room = row
+    intern = _name(intern_first, intern_last)
+    patient = _name(patient_first, patient_last)
+    if feed.resource == FeedToken.INTERN:
+        summary = patient
+    elif feed.resource == FeedToken.PATIENT:
+        summary = intern
+    else:
+        summary = f'{intern} / {patient}'
+    lines = [
+        fold('BEGIN:VEVENT'),
+        fold(f'UID:schedule-{pk}@{host}'),
+        fold(f'DTSTAMP:{_stamp(updated)}'),
+        fold(f'DTSTART:{_stamp(start)}'),
+        fold(f'DTEND:{_stamp(end)}'),
+        fold(f'SUMMARY:{escape(summary)}'),
+    ]
+    if room:
+        lines.append(fold(f'LOCATION:{escape(room)}'))
+    lines.append(fold('END:VEVENT'))
+    return ''.join(lines)
+
+
+def _rows(queryset):
+    return queryset.order_by('start_time', 'pk').values_list(*COLUMNS)
+
+
+def events(feed, queryset, host):
+    yield _header(feed)
+    for row in _rows(queryset).iterator(chunk_size=CHUNK_SIZE):
+        yield _event(feed, row, host)
+    yield fold('END:VCALENDAR')
+
+
+def _chunk(queryset, after):
+    # the rows after (start_time, pk) `after`, one chunk
+    rows = _rows(queryset)
+    if after is not None:
+        rows = rows.filter(Q(start_time__gt=after[0]) | Q(start_time=after[0], pk__gt=after[1]))
+    return list(rows[:CHUNK_SIZE])
+
+
+async def aevents(feed, queryset, host):
+    yield await sync_to_async(_header)(feed)
+    after = None
+    while True:
+        rows = await sync_to_async(_chunk)(queryset, after)
+        yield ''.join(_event(feed, row, host) for row in rows)
+        if len(rows) < CHUNK_SIZE:
+            break
+        after = (rows[-1][1], rows[-1][0])
+    yield fold('END:VCALENDAR')
+
+
+@require_GET
+def calendar_feed(request, token):
+    # tokens made in the admin may have no creator
+    feed = FeedToken.objects.filter(
+        Q(created_by__isnull=True) | Q(created_by__is_active=True), token=token,
+    ).first()
+    if feed is None:
+        return HttpResponse(status=404)
+    try:
+        start = parse_bound(request.GET.get('start'))
+        end = parse_bound(request.GET.get('end'), end=True)
+    except ValueError as e:
+        return JsonResponse({'detail': str(e)}, status=400)
+    if start is None and end is None and request.GET.get('window') != 'all':
+        # calendar apps poll without parameters: everything from a while back, moving a day at a time
+        # so the ETag stays put between polls
+        start = parse_bound((timezone.localdate() - timedelta(days=settings.CALENDAR_FEED_PAST_DAYS)).isoformat())
+    queryset = feed_queryset(feed, start, end)
+
+    state = queryset.order_by().aggregate(last=Max('updated_at'), count=Count('pk'))
+    last = state['last']
+    parts = [
+        feed.token, feed.resource, str(feed.object_id), start.isoformat() if start else '',
+        end.isoformat() if end else '', str(state['count']), last.isoformat() if last else '',
+    ]
+    parts.extend(dependency_parts(NAME_DEPENDENCIES))
+    etag = f'"{hashlib.sha1("|".join(parts).encode()).hexdigest()}"'
+    headers = {'ETag': etag, 'Cache-Control': f'private, max-age={settings.CALENDAR_FEED_MAX_AGE}'}
+    if last is not None:
+        headers['Last-Modified'] = http_date(int(last.timestamp()))
+    if etag in {tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')}:
+        response = HttpResponseNotModified()
+    else:
+        # the server only streams iterators of its own kind without buffering them
+        stream = aevents if isinstance(request, ASGIRequest) else events
+        response = StreamingHttpResponse(
+            stream(feed, queryset, request.get_host().split(':')[0]), content_type='text/calendar; charset=utf-8',
+        )
+        response['Content-Disposition'] = f'inline; filename="{feed.resource}-{feed.object_id}.ics"'
+    for name, value in headers.items():
+        response[name] = value
+    return response
@@ -0,0 +1,36 @@
+"""
+Password hashers with their cost taken from settings.
+
+Same algorithms (and stored hash prefixes) as Django's, so existing hashes
+keep verifying. Changing a cost, or ``PASSWORD_HASHER`` in settings, makes
+Django rehash each password the next time its user logs in.
+"""
+from django.conf import settings
+from django.contrib.auth import hashers
+
+
+def _setting(name, default):
+    return getattr(settings, name, None) or default
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    @property
+    def iterations(self):
+        return _setting('PASSWORD_PBKDF2_ITERATIONS', hashers.PBKDF2PasswordHasher.iterations)
+
+
+class Argon2PasswordHasher(hashers.Argon2PasswordHasher):
+    # needs argon2-cffi
+    @property
+    def time_cost(self):
+        return _setting('PASSWORD_ARGON2_TIME_COST', hashers.Argon2PasswordHasher.time_cost)
+
+    @property
+    def memory_cost(self):
+        return _setting('PASSWORD_ARGON2_MEMORY_COST', hashers.Argon2PasswordHasher.memory_cost)
+
+
+class ScryptPasswordHasher(hashers.ScryptPasswordHasher):
+    @property
+    def work_factor(self):
+        return _setting('PASSWORD_SCRYPT_WORK_FACTOR', hashers.ScryptPasswordHasher.work_factor)
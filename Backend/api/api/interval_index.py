@@ -0,0 +1,256 @@
+"""
+In-memory interval index over ``Schedule`` bookings.
+
+Each resource (intern, patient, room) gets its own interval tree keyed by
+``start_time``/``end_time``, so overlap checks cost O(log n + k) instead of a
+scan over every booking. The index is built lazily on first use and then kept
+current from the ``Schedule`` save/delete signals (see ``signals.py``). Writes
+made by other worker processes are picked up from the change journal before
+every lookup, so the trees can trail the database by a moment: they serve
+read-only views (the conflicts report), while booking validation queries the
+database (``booking.overlapping_bookings``).
+"""
+import random
+import threading
+
+from . import journal
+from .models import ChangeLogEntry, Schedule
+
+
+class _Node:
+    __slots__ = ('start', 'end', 'key', 'priority', 'max_end', 'left', 'right')
+
+    def __init__(self, start, end, key):
+        self.start = start
+        self.end = end
+        self.key = key
+        self.priority = random.random()
+        self.max_end = end
+        self.left = None
+        self.right = None
+
+    def sort_key(self):
+        return (self.start, self.key)
+
+    def update(self):
+        m = self.end
+        if self.left is not None and self.left.max_end > m:
+            m = self.left.max_end
+        if self.right is not None and self.right.max_end > m:
+            m = self.right.max_end
+        self.max_end = m
+
+
+def _rotate_right(node):
+    left = node.left
+    node.left = left.right
+    left.right = node
+    node.update()
+    left.update()
+    return left
+
+
+def _rotate_left(node):
+    right = node.right
+    node.right = right.left
+    right.left = node
+    node.update()
+    right.update()
+    return right
+
+
+class IntervalTree:
+    """Treap ordered by (start, key) and augmented with the subtree's max end."""
+
+    def __init__(self):
+        self.root = None
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, start, end, key):
+        self.root = self._insert(self.root, _Node(start, end, key))
+        self.size += 1
+
+    def _insert(self, node, new):
+        if node is None:
+            return new
+        if new.sort_key() < node.sort_key():
+            node.left = self._insert(node.left, new)
+            if node.left.priority > node.priority:
+                node = _rotate_right(node)
+        else:
+            node.right = self._insert(node.right, new)
+            if node.right.priority > node.priority:
+                node = _rotate_left(node)
+        node.update()
+        return node
+
+    def remove(self, start, key):
+        self.root, removed = self._remove(self.root, (start, key))
+        if removed:
+            self.size -= 1
+        return removed
+
+    def _remove(self, node, sort_key):
+        if node is None:
+            return None, False
+        current = node.sort_key()
+        if sort_key < current:
+            node.left, removed = self._remove(node.left, sort_key)
+        elif sort_key > current:
+            node.right, removed = self._remove(node.right, sort_key)
+        else:
+            if node.left is None:
+                return node.right, True
+            if node.right is None:
+                return node.left, True
+            if node.left.priority > node.right.priority:
+                node = _rotate_right(node)
+                node.right, removed = self._remove(node.right, sort_key)
+            else:
+                node = _rotate_left(node)
+                node.left, removed = self._remove(node.left, sort_key)
+        node.update()
+        return node, removed
+
+    def overlapping(self, start, end):
+        """Return (start, end, key) for every stored interval overlapping [start, end)."""
+        found = []
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            # nothing in this subtree ends after `start`
+            if node is None or node.max_end <= start:
+                continue
+            stack.append(node.left)
+            if node.start < end:
+                if node.end > start:
+                    found.append((node.start, node.end, node.key))
+                # the right subtree only holds intervals starting at or after node.start
+                stack.append(node.right)
+        found.sort()
+        return found
+
+
+RESOURCES = ('intern', 'patient', 'room')
+
+
+class ScheduleIndex:
+    """Per-resource interval trees over all bookings, safe to share between threads."""
+
+    _columns = ('id', 'intern_id', 'patient_id', 'room_id', 'start_time', 'end_time')
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._trees = None
+        self._rows = {}
+        self._version = 0
+
+    def _ensure_loaded(self):
+        if self._trees is not None:
+            self._catch_up()
+            return
+        self._trees = {}
+        self._rows = {}
+        # read the journal head first so changes racing with the load are replayed
+        self._version = journal.settled_version()
+        rows = Schedule.objects.values_list(*self._columns)
+        for row in rows.iterator():
+            self._add(*row)
+
+    def _catch_up(self):
+        # replay schedule changes journaled since the last lookup (possibly by other processes),
+        # up to the settled head so a late commit below it isn't skipped
+        head = journal.settled_version()
+        if head <= self._version:
+            return
+        entries = list(
+            ChangeLogEntry.objects.filter(id__gt=self._version, id__lte=head, model='schedule')
+            .order_by('id').values_list('id', 'object_id')
+        )
+        self._version = head
+        if not entries:
+            return
+        ids = {object_id for _, object_id in entries}
+        for pk in ids:
+            self._discard(pk)
+        for row in Schedule.objects.filter(pk__in=ids).values_list(*self._columns):
+            self._add(*row)
+
+    def _tree(self, resource, resource_id, create=False):
+        tree = self._trees.get((resource, resource_id))
+        if tree is None and create:
+            tree = self._trees[(resource, resource_id)] = IntervalTree()
+        return tree
+
+    def _add(self, pk, intern_id, patient_id, room_id, start, end):
+        row = (intern_id, patient_id, room_id, start, end)
+        self._rows[pk] = row
+        for resource, resource_id in zip(RESOURCES, row[:3]):
+            if resource_id is not None:
+                self._tree(resource, resource_id, create=True).insert(start, end, pk)
+
+    def _discard(self, pk):
+        row = self._rows.pop(pk, None)
+        if row is None:
+            return
+        start = row[3]
+        for resource, resource_id in zip(RESOURCES, row[:3]):
+            tree = self._tree(resource, resource_id)
+            if tree is not None:
+                tree.remove(start, pk)
+                if not len(tree):
+                    del self._trees[(resource, resource_id)]
+
+    def reset(self):
+        with self._lock:
+            self._trees = None
+            self._rows = {}
+            self._version = 0
+
+    def upsert(self, schedule):
+        with self._lock:
+            if self._trees is None:
+                return
+            self._discard(schedule.pk)
+            self._add(schedule.pk, schedule.intern_id, schedule.patient_id, schedule.room_id,
+                      schedule.start_time, schedule.end_time)
+
+    def discard(self, pk):
+        with self._lock:
+            if self._trees is None:
+                return
+            self._discard(pk)
+
+    def conflicts(self, start, end, intern=None, patient=None, room=None, exclude=None):
+        """Map each booked resource to the ids of bookings overlapping [start, end)."""
+        result = {}
+        with self._lock:
+            self._ensure_loaded()
+            for resource, resource_id in zip(RESOURCES, (intern, patient, room)):
+                if resource_id is None:
+                    continue
+                tree = self._tree(resource, resource_id)
+                if tree is None:
+                    continue
+                ids = [key for _, _, key in tree.overlapping(start, end) if key != exclude]
+                if ids:
+                    result[resource] = ids
+        return result
+
+    def all_conflicts(self, start, end):
+        """List every pair of bookings sharing a resource that overlap inside [start, end)."""
+        found = []
+        with self._lock:
+            self._ensure_loaded()
+            for (resource, resource_id), tree in sorted(self._trees.items(), key=lambda item: (item[0][0], item[0][1])):
+                for s, e, pk in tree.overlapping(start, end):
+                    for _, _, other in tree.overlapping(max(s, start), min(e, end)):
+                        if other > pk:
+                            found.append({'resource': resource, 'resource_id': resource_id, 'schedules': [pk, other]})
+        return found
+
+
+schedule_index = ScheduleIndex()
@@ -0,0 +1,88 @@
+"""
+Change journal used for delta sync.
+
+Writes to the scheduling models append (model, id, op) rows to
+``ChangeLogEntry``. Single saves/deletes are recorded from signals; code that
+touches many rows at once wraps the work in ``batch()`` so the entries are
+written with one ``bulk_create`` instead of one INSERT per row.
+
+Ids are handed out when a row is inserted but become visible when its
+transaction commits, and on PostgreSQL those orders differ: id 11 can be read
+while id 10 is still in flight. Readers therefore stop at ``settled_version()``,
+the last id below which nothing can appear any more, and resume from there.
+"""
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import ChangeLogEntry
+
+_local = threading.local()
+
+
+def _pending():
+    return getattr(_local, 'pending', None)
+
+
+def record(model, ids, op):
+    entries = [ChangeLogEntry(model=model._meta.model_name, object_id=pk, op=op) for pk in ids]
+    if not entries:
+        return
+    pending = _pending()
+    if pending is not None:
+        pending.extend(entries)
+    else:
+        ChangeLogEntry.objects.bulk_create(entries)
+
+
+def record_upserts(model, ids):
+    record(model, ids, ChangeLogEntry.UPSERT)
+
+
+def record_deletes(model, ids):
+    record(model, ids, ChangeLogEntry.DELETE)
+
+
+@contextmanager
+def batch():
+    """Collect entries recorded inside the block and write them in one statement."""
+    if _pending() is not None:
+        # nested: the outermost batch flushes
+        yield
+        return
+    _local.pending = []
+    try:
+        yield
+        entries = _local.pending
+    finally:
+        _local.pending = None
+    if entries:
+        ChangeLogEntry.objects.bulk_create(entries, batch_size=1000)
+
+
+# newest entries inspected for gaps; a burst larger than this within the settle
+# window is treated as settled from its oldest entry on
+SETTLE_TAIL = 1000
+
+
+def settled_version():
+    """
+    The journal head readers may advance to.
+
+    A gap in the ids is a transaction that took an id and has not committed (or
+    rolled back, which leaves the gap for good). The head stops right before the
+    first gap followed by an entry younger than ``JOURNAL_SETTLE_SECONDS``; older
+    gaps are taken as rollbacks.
+    """
+    tail = list(ChangeLogEntry.objects.order_by('-id').values_list('id', 'created_at')[:SETTLE_TAIL])
+    if not tail:
+        return 0
+    tail.reverse()
+    cutoff = timezone.now() - timedelta(seconds=settings.JOURNAL_SETTLE_SECONDS)
+    for (previous, _), (version, created_at) in zip(tail, tail[1:]):
+        if version != previous + 1 and created_at >= cutoff:
+            return previous
+    return tail[-1][0]
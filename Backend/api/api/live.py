@@ -0,0 +1,229 @@
+"""
+Live change feed for the schedule board (Server-Sent Events, ASGI only).
+
+One broadcaster task per process polls the change journal and fans new
+schedule/availability changes out to in-memory subscriber queues, so the
+number of open streams doesn't change the number of DB connections or
+queries. Clients reconnect with ``Last-Event-ID`` and resume from the journal.
+Under WSGI the view answers 501 and clients poll ``/api/sync/`` instead.
+"""
+import asyncio
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import close_old_connections
+from django.http import JsonResponse, StreamingHttpResponse
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+from . import journal
+from .authentication import CachedJWTAuthentication
+from .models import Availability, ChangeLogEntry, PatientAvailability, Schedule
+from .serializers import AvailabilitySerializer, PatientAvailabilitySerializer, ScheduleSerializer
+from .slots import parse_bound
+
+# journal model name -> (event name, model, serializer, start field, end field)
+FEEDS = {
+    'schedule': ('schedules', Schedule, ScheduleSerializer, 'start_time', 'end_time'),
+    'availability': ('availabilities', Availability, AvailabilitySerializer, 'start_date', 'end_date'),
+    'patientavailability': ('patientavailabilities', PatientAvailability, PatientAvailabilitySerializer,
+                            'start_date', 'end_date'),
+}
+POLL_SECONDS = getattr(settings, 'LIVE_POLL_SECONDS', 1.0)
+HEARTBEAT_SECONDS = 15
+QUEUE_SIZE = 1000
+BATCH_SIZE = 500
+
+
+# every journal read of the feed runs on this one thread, i.e. one DB connection per process
+_db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='live-feed')
+
+
+def _db(func, *args):
+    return asyncio.get_running_loop().run_in_executor(_db_executor, func, *args)
+
+
+def _load_changes(since):
+    # one journal query plus one per changed model
+    close_old_connections()
+    # stop at the settled head: past it an earlier id may still commit (api/journal.py)
+    head = journal.settled_version()
+    entries = list(
+        ChangeLogEntry.objects.filter(id__gt=since, id__lte=head, model__in=list(FEEDS))
+        .order_by('id').values_list('id', 'model', 'object_id', 'op')[:BATCH_SIZE]
+    )
+    if not entries:
+        return max(since, head), []
+    rows = {}
+    for model, (_, model_cls, serializer_cls, _, _) in FEEDS.items():
+        ids = {pk for _, m, pk, op in entries if m == model and op == ChangeLogEntry.UPSERT}
+        if ids:
+            objs = model_cls.objects.filter(pk__in=ids)
+            rows[model] = {obj.pk: (obj, serializer_cls(obj).data) for obj in objs}
+    events = []
+    for version, model, pk, op in entries:
+        obj, data = rows.get(model, {}).get(pk, (None, None))
+        if op == ChangeLogEntry.UPSERT and obj is None:
+            # removed again before we got to it; a later tombstone follows
+            continue
+        events.append({'version': version, 'model': model, 'op': op, 'id': pk, 'obj': obj, 'data': data})
+    return entries[-1][0], events
+
+
+def _head():
+    close_old_connections()
+    return journal.settled_version()
+
+
+class Subscription:
+    def __init__(self, start=None, end=None, intern=None, patient=None):
+        self.start = start
+        self.end = end
+        self.intern = intern
+        self.patient = patient
+        self.queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self.overflowed = False
+
+    def matches(self, event):
+        obj = event['obj']
+        if obj is None:
+            # tombstones carry no row to filter on; clients drop unknown ids
+            return True
+        _, _, _, start_field, end_field = FEEDS[event['model']]
+        if self.start is not None and getattr(obj, end_field) <= self.start:
+            return False
+        if self.end is not None and getattr(obj, start_field) >= self.end:
+            return False
+        # filters only apply to resources that have the field
+        if self.intern is not None and hasattr(obj, 'intern_id') and obj.intern_id != self.intern:
+            return False
+        if self.patient is not None and hasattr(obj, 'patient_id') and obj.patient_id != self.patient:
+            return False
+        return True
+
+    def event_for(self, event):
+        """
+        What this subscriber is sent for ``event``. The journal doesn't keep a
+        row's previous state, so an upsert outside the filters may be a row
+        that just moved out of them (another intern, patient or window): it
+        goes out as a tombstone, which clients ignore for ids they don't show.
+        """
+        if self.matches(event):
+            return event
+        return {**event, 'op': ChangeLogEntry.DELETE, 'obj': None, 'data': None}
+
+
+class ChangeBroadcaster:
+    def __init__(self):
+        self.subscribers = set()
+        self.version = None
+        self._task = None
+
+    async def subscribe(self, subscription):
+        if self._task is None or self._task.done():
+            # the task stopped with the last subscriber; what was journaled since is nobody's live
+            # traffic (reconnecting clients replay it from Last-Event-ID), so restart from the head
+            head = await _db(_head)
+            if self._task is None or self._task.done():
+                self.version = head
+                self._task = asyncio.create_task(self._run())
+        self.subscribers.add(subscription)
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+
+    async def _run(self):
+        while self.subscribers:
+            version, events = await _db(_load_changes, self.version)
+            self.version = version
+            for event in events:
+                for sub in list(self.subscribers):
+                    try:
+                        sub.queue.put_nowait(sub.event_for(event))
+                    except asyncio.QueueFull:
+                        # slow client: drop it, it resumes from Last-Event-ID on reconnect
+                        sub.overflowed = True
+                        self.subscribers.discard(sub)
+            if len(events) < BATCH_SIZE:
+                await asyncio.sleep(POLL_SECONDS)
+
+
+broadcaster = ChangeBroadcaster()
+
+
+def _format(event):
+    name = FEEDS[event['model']][0]
+    payload = {'op': 'delete' if event['op'] == ChangeLogEntry.DELETE else 'upsert', 'id': event['id']}
+    if event['data'] is not None:
+        payload['data'] = event['data']
+    return f"id: {event['version']}\nevent: {name}\ndata: {json.dumps(payload)}\n\n"
+
+
+def _authenticate(request):
+    # EventSource can't send headers, so the access token may also come as ?token=
+    auth = CachedJWTAuthentication()
+    raw = request.GET.get('token')
+    if raw is None:
+        header = auth.get_header(request)
+        raw = auth.get_raw_token(header) if header else None
+    if raw is None:
+        return None
+    try:
+        return auth.get_user(auth.get_validated_token(raw))
+    except (InvalidToken, TokenError, AuthenticationFailed):
+        return None
+
+
+async def _stream(subscription, resume_from, live_from):
+    try:
+        yield 'retry: 3000\n\n'
+        # replay what the client missed while disconnected, straight from the journal;
+        # everything after `live_from` arrives through the queue
+        while resume_from is not None and resume_from < live_from:
+            version, events = await _db(_load_changes, resume_from)
+            if version == resume_from:
+                break
+            resume_from = version
+            for event in events:
+                if event['version'] <= live_from:
+                    yield _format(subscription.event_for(event))
+        while not subscription.overflowed:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ': keep-alive\n\n'
+                continue
+            yield _format(event)
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+async def live_changes(request):
+    if not isinstance(request, ASGIRequest):
+        # a WSGI worker would drain the endless stream into memory before sending any of it
+        return JsonResponse(
+            {'detail': 'The live feed needs the ASGI server (api.asgi); poll /api/sync/ instead.'}, status=501,
+        )
+    user = await sync_to_async(_authenticate)(request)
+    if user is None or not user.is_active:
+        return JsonResponse({'detail': 'Authentication credentials were not provided or are invalid.'}, status=401)
+    try:
+        subscription = Subscription(
+            start=parse_bound(request.GET.get('start')),
+            end=parse_bound(request.GET.get('end'), end=True),
+            intern=int(request.GET['intern']) if request.GET.get('intern') else None,
+            patient=int(request.GET['patient']) if request.GET.get('patient') else None,
+        )
+        last_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        resume_from = int(last_id) if last_id else None
+    except ValueError as e:
+        return JsonResponse({'detail': str(e)}, status=400)
+    await broadcaster.subscribe(subscription)
+    stream = _stream(subscription, resume_from, broadcaster.version)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,166 @@
+import json
+import platform
+import time
+from datetime import timedelta
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from api.metrics import QueryRecorder
+from api.models import Availability, Estagiario, Patient, PatientAvailability, Schedule
+from api.urls import router
+
+BENCH_EMAIL = 'bench@clinic.test'
+BENCH_PASSWORD = 'bench-password'
+
+# routes that need query parameters to do any work
+LIST_PARAMS = {
+    'slot': lambda start, end: {'start': start.date().isoformat(), 'end': end.date().isoformat()},
+    'calendar': lambda start, end: {'start': start.date().isoformat(), 'end': end.date().isoformat()},
+}
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(q * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+class Command(BaseCommand):
+    help = (
+        'Hit every router endpoint (and the token endpoint) with the test client and print p50/p95 '
+        'latency, query counts and payload sizes as JSON. Seed data first with seed_clinic.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--days', type=int, default=7, help='width of the start/end window used for lists')
+        parser.add_argument('--only', help='comma-separated case names to run')
+        parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+        parser.add_argument('--compare', help='previous report; print the change of every case to stderr')
+        parser.add_argument('--response-cache', action='store_true',
+                            help='keep the response cache on (off by default so every request reaches the database)')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1')
+        with override_settings(ALLOWED_HOSTS=['testserver'], RESPONSE_CACHE=options['response_cache']):
+            report = self.run(options)
+        text = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(text + '\n')
+        else:
+            self.stdout.write(text)
+        if options['compare']:
+            with open(options['compare']) as f:
+                self.compare(json.load(f), report)
+
+    def cases(self):
+        """(name, method, url, body) for every route of the API router plus the token endpoint."""
+        start = timezone.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        end = start + timedelta(days=self.days)
+        window = {'start': start.isoformat(), 'end': end.isoformat()}
+        cases = [('token', 'post', reverse('token_obtain_pair'), {'email': BENCH_EMAIL, 'password': BENCH_PASSWORD})]
+        for prefix, viewset, basename in router.registry:
+            params = LIST_PARAMS.get(basename, {})
+            if callable(params):
+                params = params(start, end)
+            cases.append((f'{prefix} list', 'get', reverse(f'api:{basename}-list'), params or {}))
+            if hasattr(viewset, 'queryset') and viewset.queryset is not None:
+                pk = viewset.queryset.values_list('pk', flat=True).first()
+                if pk is not None:
+                    cases.append((f'{prefix} detail', 'get', reverse(f'api:{basename}-detail', args=[pk]), {}))
+        # the list endpoints again with the date window the frontend uses
+        for prefix, basename in (('schedules', 'schedule'), ('availabilities', 'availability'),
+                                 ('patientavailabilities', 'patientavailability')):
+            cases.append((f'{prefix} list window', 'get', reverse(f'api:{basename}-list'), window))
+        intern = Estagiario.objects.filter(is_active=True).values_list('pk', flat=True).first()
+        patient = Patient.objects.filter(is_active=True).values_list('pk', flat=True).first()
+        if intern is not None:
+            cases.append(('schedules by intern', 'get', reverse('api:schedule-list'), {**window, 'intern': intern}))
+        if patient is not None:
+            cases.append(('slots for patient', 'get', reverse('api:slot-list'),
+                          {**LIST_PARAMS['slot'](start, end), 'patient': patient}))
+        cases.append(('schedules search', 'get', reverse('api:schedule-list'), {'q': 'ana', 'window': 'all'}))
+        cases.append(('schedules conflicts', 'get', reverse('api:schedule-conflicts'), window))
+        cases.append(('availabilityrules occurrences', 'get', reverse('api:availabilityrule-occurrences'), window))
+        return cases
+
+    def request(self, client, method, url, body):
+        if method == 'post':
+            return client.post(url, body, content_type='application/json')
+        return client.get(url, body)
+
+    def run(self, options):
+        self.days = options['days']
+        User = get_user_model()
+        user = User.objects.filter(username='bench').first()
+        if user is None:
+            user = User.objects.create_user('bench', BENCH_EMAIL, BENCH_PASSWORD, is_staff=True)
+        client = Client()
+        response = client.post(reverse('token_obtain_pair'), {'email': BENCH_EMAIL, 'password': BENCH_PASSWORD},
+                               content_type='application/json')
+        if response.status_code != 200:
+            raise CommandError(f'could not obtain a token: {response.status_code} {response.content[:200]!r}')
+        client.defaults['HTTP_AUTHORIZATION'] = f"Bearer {response.json()['access']}"
+
+        only = {name.strip() for name in options['only'].split(',')} if options['only'] else None
+        results = {}
+        for name, method, url, body in self.cases():
+            if only is not None and name not in only:
+                continue
+            for _ in range(options['warmup']):
+                self.request(client, method, url, body)
+            # queries are counted on a separate run so capturing them doesn't skew the timings
+            recorder = QueryRecorder()
+            with connection.execute_wrapper(recorder):
+                response = self.request(client, method, url, body)
+            timings = []
+            for _ in range(options['repeat']):
+                started = time.perf_counter()
+                self.request(client, method, url, body)
+                timings.append((time.perf_counter() - started) * 1000)
+            content = b''.join(response.streaming_content) if response.streaming else response.content
+            results[name] = {
+                'method': method.upper(),
+                'url': url,
+                'params': body if method == 'get' else {},
+                'status': response.status_code,
+                'p50_ms': round(percentile(timings, 0.50), 2),
+                'p95_ms': round(percentile(timings, 0.95), 2),
+                'mean_ms': round(sum(timings) / len(timings), 2),
+                'queries': recorder.count,
+                'bytes': len(content),
+            }
+        return {
+            'meta': {
+                'vendor': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'repeat': options['repeat'],
+                'rows': {
+                    model.__name__: model.objects.count()
+                    for model in (Estagiario, Patient, Availability, PatientAvailability, Schedule)
+                },
+            },
+            'results': results,
+        }
+
+    def compare(self, before, after):
+        for name, now in sorted(after['results'].items()):
+            then = before.get('results', {}).get(name)
+            if then is None:
+                continue
+            change = (now['p50_ms'] - then['p50_ms']) / then['p50_ms'] * 100 if then['p50_ms'] else 0.0
+            self.stderr.write(
+                f"{name:40} p50 {then['p50_ms']:8.2f} -> {now['p50_ms']:8.2f} ms ({change:+.0f}%)  "
+                f"queries {then['queries']} -> {now['queries']}  bytes {then['bytes']} -> {now['bytes']}"
+            )
@@ -0,0 +1,136 @@
+import json
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import get_hasher, make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils.module_loading import import_string
+
+from api.metrics import QueryRecorder
+
+from .bench_api import percentile
+
+PASSWORD = 'bench-login-password'
+ALGORITHMS = {'pbkdf2': 'pbkdf2_sha256', 'argon2': 'argon2', 'scrypt': 'scrypt'}
+
+
+def email(n):
+    return f'Bench.Login.{n}@Clinic.test'
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure login throughput: POST the token endpoint by email from N threads at once and print '
+        'logins/s, p50/p95 latency and queries per login as JSON. Creates bench-login-* users (removed '
+        'afterwards unless --keep).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=200, help='logins per concurrency level')
+        parser.add_argument('--concurrency', default='1,4,16', help='comma-separated thread counts')
+        parser.add_argument('--hasher', choices=sorted(ALGORITHMS),
+                            help='preferred hasher for this run (stored passwords are rehashed on the warm-up login)')
+        parser.add_argument('--keep', action='store_true', help='keep the bench-login-* users')
+        parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1 or options['requests'] < 1:
+            raise CommandError('--users and --requests must be at least 1')
+        try:
+            levels = [int(n) for n in options['concurrency'].split(',') if n.strip()]
+        except ValueError:
+            raise CommandError('--concurrency must be comma-separated integers')
+        overrides = {'ALLOWED_HOSTS': ['testserver']}
+        if options['hasher']:
+            algorithm = ALGORITHMS[options['hasher']]
+            preferred = [path for path in settings.PASSWORD_HASHERS if import_string(path).algorithm == algorithm]
+            if not preferred:
+                raise CommandError(f'{algorithm} is not in PASSWORD_HASHERS')
+            overrides['PASSWORD_HASHERS'] = preferred + [h for h in settings.PASSWORD_HASHERS if h not in preferred]
+        User = get_user_model()
+        try:
+            with override_settings(**overrides):
+                report = self.run(options, levels)
+        finally:
+            if not options['keep']:
+                User.objects.filter(username__startswith='bench-login-').delete()
+        text = json.dumps(report, indent=2, sort_keys=True)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(text + '\n')
+        else:
+            self.stdout.write(text)
+
+    def login(self, client, n):
+        started = time.perf_counter()
+        response = client.post(reverse('token_obtain_pair'), {'email': email(n).lower(), 'password': PASSWORD},
+                               content_type='application/json')
+        return (time.perf_counter() - started) * 1000, response.status_code
+
+    def run(self, options, levels):
+        User = get_user_model()
+        users = options['users']
+        existing = set(User.objects.filter(username__startswith='bench-login-').values_list('username', flat=True))
+        password = make_password(PASSWORD)
+        User.objects.bulk_create([
+            User(username=f'bench-login-{n}', email=email(n), password=password)
+            for n in range(users) if f'bench-login-{n}' not in existing
+        ], batch_size=1000)
+
+        # one login per user first: it pays for any rehash, the measured ones don't
+        client = Client()
+        started = time.perf_counter()
+        statuses = [self.login(client, n)[1] for n in range(users)]
+        warmup_ms = (time.perf_counter() - started) * 1000
+        if any(status != 200 for status in statuses):
+            raise CommandError(f'warm-up logins failed: {sorted(set(statuses))}')
+        recorder = QueryRecorder()
+        with connection.execute_wrapper(recorder):
+            self.login(client, 0)
+
+        def worker(chunk):
+            client = Client()
+            try:
+                return [self.login(client, n % users) for n in chunk]
+            finally:
+                connection.close()
+
+        results = {}
+        for threads in levels:
+            chunks = [range(i, options['requests'], threads) for i in range(threads)]
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=threads) as pool:
+                samples = [sample for part in pool.map(worker, chunks) for sample in part]
+            elapsed = time.perf_counter() - started
+            timings = [ms for ms, _ in samples]
+            results[str(threads)] = {
+                'logins_per_s': round(len(samples) / elapsed, 1),
+                'p50_ms': round(percentile(timings, 0.50), 2),
+                'p95_ms': round(percentile(timings, 0.95), 2),
+                'errors': sum(1 for _, status in samples if status != 200),
+            }
+        hasher = get_hasher()
+        return {
+            'meta': {
+                'vendor': connection.vendor,
+                'django': django.get_version(),
+                'python': platform.python_version(),
+                'hasher': hasher.algorithm,
+                'work': {name: getattr(hasher, name) for name in ('iterations', 'time_cost', 'memory_cost',
+                                                                   'work_factor') if hasattr(hasher, name)},
+                'users': users,
+                'requests': options['requests'],
+            },
+            'warmup_ms': round(warmup_ms, 1),
+            'queries_per_login': recorder.count,
+            'results': results,
+        }
@@ -0,0 +1,106 @@
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from api.fastlist import row_builder
+from api.models import Availability, Estagiario, Patient, PatientAvailability, Room, Schedule
+from api.renderers import FastJSONRenderer, orjson
+from api.serializers import (
+    AvailabilitySerializer, EstagiarioSerializer, PatientAvailabilitySerializer, PatientSerializer, ScheduleSerializer,
+)
+
+RESOURCES = (
+    ('schedules', Schedule, ScheduleSerializer),
+    ('availabilities', Availability, AvailabilitySerializer),
+    ('patientavailabilities', PatientAvailability, PatientAvailabilitySerializer),
+    ('patients', Patient, PatientSerializer),
+    ('estagiarios', Estagiario, EstagiarioSerializer),
+)
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare ModelSerializer + JSONRenderer against the fast list path on N rows per resource, '
+        'failing if the rendered bytes differ. Rows are generated inside a transaction that is rolled back.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=10000)
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            with transaction.atomic():
+                self.generate(options['rows'])
+                failures = self.compare(options['repeat'])
+                raise Rollback
+        except Rollback:
+            pass
+        if failures:
+            raise CommandError(f'output differs for: {", ".join(failures)}')
+
+    def generate(self, rows):
+        start = timezone.now().replace(minute=0, second=0, microsecond=0)
+        interns = Estagiario.objects.bulk_create(
+            [Estagiario(first_name=f'Intern {i}', last_name='Bench', email=f'i{i}@bench.test') for i in range(rows)]
+        )
+        patients = Patient.objects.bulk_create(
+            [Patient(first_name=f'Patient {i}', last_name='Bénch', email=f'p{i}@bench.test') for i in range(rows)]
+        )
+        rooms = Room.objects.bulk_create([Room(name=f'Bench room {i}') for i in range(8)])
+        slots = [(start + timedelta(hours=i), start + timedelta(hours=i, minutes=50)) for i in range(rows)]
+        Availability.objects.bulk_create(
+            [Availability(intern=interns[i % 50], start_date=s, end_date=e) for i, (s, e) in enumerate(slots)],
+            batch_size=1000,
+        )
+        PatientAvailability.objects.bulk_create(
+            [PatientAvailability(patient=patients[i % 50], start_date=s, end_date=e) for i, (s, e) in enumerate(slots)],
+            batch_size=1000,
+        )
+        Schedule.objects.bulk_create(
+            [Schedule(intern=interns[i % 50], patient=patients[i % 70], room=rooms[i % 9 - 1] if i % 9 else None,
+                      start_time=s, end_time=e)
+             for i, (s, e) in enumerate(slots)],
+            batch_size=1000,
+        )
+
+    def best_of(self, repeat, func):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            timings.append(time.perf_counter() - started)
+        return min(timings), result
+
+    def compare(self, repeat):
+        self.stdout.write(f'encoder: {"orjson" if orjson else "json (orjson not installed)"}')
+        failures = []
+        for name, model, serializer_cls in RESOURCES:
+            queryset = model.objects.order_by('id')
+
+            def regular():
+                return JSONRenderer().render(serializer_cls(queryset, many=True).data)
+
+            def fast():
+                columns, build = row_builder(serializer_cls())
+                return FastJSONRenderer().render([build(row) for row in queryset.values(*columns)])
+
+            slow_time, slow_bytes = self.best_of(repeat, regular)
+            fast_time, fast_bytes = self.best_of(repeat, fast)
+            same = slow_bytes == fast_bytes
+            if not same:
+                failures.append(name)
+            self.stdout.write(
+                f'{name:22} {queryset.count():6} rows  serializer {slow_time * 1000:8.1f} ms  '
+                f'fast {fast_time * 1000:8.1f} ms  x{slow_time / fast_time:5.1f}  '
+                f'{len(fast_bytes)} bytes  {"identical" if same else "DIFFERENT"}'
+            )
+        return failures
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.coalesce import OWNER_FIELDS, coalesce
+from api.models import Availability, PatientAvailability
+
+
+class Command(BaseCommand):
+    help = 'Merge overlapping and adjacent availability rows per intern and per patient.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='only report what would be collapsed')
+
+    def handle(self, *args, **options):
+        dry_run = options['dry_run']
+        total = 0
+        for model in (Availability, PatientAvailability):
+            survivors, collapsed = coalesce(model, dry_run=dry_run)
+            total += collapsed
+            kept = len(set(survivors.values()))
+            self.stdout.write(
+                f'{model.__name__} (per {OWNER_FIELDS[model][:-3]}): {collapsed} rows merged into {kept}'
+            )
+        verb = 'would be' if dry_run else 'were'
+        self.stdout.write(self.style.SUCCESS(f'{total} rows {verb} collapsed'))
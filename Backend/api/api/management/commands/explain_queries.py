@@ -0,0 +1,62 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.utils import timezone
+
+from api.models import Availability, PatientAvailability, Schedule
+
+# plan fragments that mean an index drives the lookup
+INDEX_MARKERS = {
+    'sqlite': ('USING INDEX', 'USING COVERING INDEX'),
+    'postgresql': ('Index Scan', 'Index Only Scan', 'Bitmap Index Scan'),
+}
+
+
+def hot_queries():
+    # the range filters issued by the list endpoints and the slot engine
+    start = timezone.now()
+    end = start + timedelta(days=7)
+    return {
+        'schedules by intern': Schedule.objects.filter(intern_id=1, start_time__gte=start, start_time__lt=end),
+        'schedules by patient': Schedule.objects.filter(patient_id=1, start_time__gte=start, start_time__lt=end),
+        'schedules by room': Schedule.objects.filter(room_id=1, start_time__gte=start, start_time__lt=end),
+        'schedules window': Schedule.objects.filter(start_time__lt=end, end_time__gt=start).order_by('start_time', 'id'),
+        'availabilities by intern': Availability.objects.filter(intern_id=1, start_date__gte=start, start_date__lt=end),
+        'availabilities window': Availability.objects.filter(start_date__lt=end, end_date__gt=start).order_by('start_date', 'id'),
+        'patient availabilities by patient': PatientAvailability.objects.filter(
+            patient_id=1, start_date__gte=start, start_date__lt=end
+        ),
+        'patient availabilities window': PatientAvailability.objects.filter(
+            start_date__lt=end, end_date__gt=start
+        ).order_by('start_date', 'id'),
+    }
+
+
+class Command(BaseCommand):
+    help = 'EXPLAIN the scheduling range queries and fail unless each one is served by an index.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verbose-plans', action='store_true', help='print the full plan of every query')
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        markers = INDEX_MARKERS.get(vendor)
+        if markers is None:
+            raise CommandError(f'unsupported database vendor: {vendor}')
+        failures = []
+        with transaction.atomic():
+            if vendor == 'postgresql':
+                # small or empty tables make seq scans cheaper; we only want to know the index is usable
+                with connection.cursor() as cursor:
+                    cursor.execute('SET LOCAL enable_seqscan = off')
+            for name, qs in hot_queries().items():
+                plan = qs.explain()
+                ok = any(marker in plan for marker in markers)
+                self.stdout.write(f"{'ok  ' if ok else 'FAIL'} {name}")
+                if options['verbose_plans'] or not ok:
+                    self.stdout.write(plan)
+                if not ok:
+                    failures.append(name)
+        if failures:
+            raise CommandError(f'{len(failures)} queries not using an index: {", ".join(failures)}')
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from api.cascade import run_job
+from api.models import CascadeJob
+
+
+class Command(BaseCommand):
+    help = 'Run (or resume after a restart) soft-delete cascade jobs that have not finished.'
+
+    def handle(self, *args, **options):
+        jobs = CascadeJob.objects.filter(status__in=[CascadeJob.PENDING, CascadeJob.RUNNING]).order_by('id')
+        for job in jobs:
+            run_job(job)
+            job.refresh_from_db()
+            self.stdout.write(f'job {job.pk} ({job.model}={job.object_id}): {job.status}, {job.done} rows removed')
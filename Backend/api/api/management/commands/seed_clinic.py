@@ -0,0 +1,172 @@
+import random
+from datetime import datetime, time, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from api import journal
+from api.models import Availability, Estagiario, Patient, PatientAvailability, Room, Schedule, Turma
+from api.search import build_document
+from api.signals import bulk_saved
+
+FIRST_NAMES = (
+    'Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Henrique', 'Isabela', 'João',
+    'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael', 'Sofia', 'Tiago', 'Vitória', 'Yuri',
+)
+LAST_NAMES = (
+    'Almeida', 'Barbosa', 'Cardoso', 'Dias', 'Esteves', 'Ferreira', 'Gomes', 'Lima', 'Martins', 'Nunes',
+    'Oliveira', 'Pereira', 'Ribeiro', 'Santos', 'Teixeira', 'Vieira',
+)
+# clinic hours, in whole hours
+OPEN_HOUR = 8
+CLOSE_HOUR = 20
+SEED_TAG = 'seed_clinic'
+
+
+class Command(BaseCommand):
+    help = (
+        'Generate a synthetic clinic (turmas, interns, patients, weekly availabilities and bookings) '
+        'for benchmarks. The same --seed always produces the same data.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--turmas', type=int, default=4)
+        parser.add_argument('--interns', type=int, default=40)
+        parser.add_argument('--patients', type=int, default=300)
+        parser.add_argument('--weeks', type=int, default=16)
+        parser.add_argument('--start', help='Monday of the first week (YYYY-MM-DD); default: this week')
+        parser.add_argument('--booking-rate', type=float, default=0.6,
+                            help='share of intern availability hours that get booked')
+        parser.add_argument('--rooms', type=int, default=12)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--flush', action='store_true', help='delete all scheduling data first')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        if options['start']:
+            first_day = parse_date(options['start'])
+            if first_day is None:
+                raise CommandError('--start must be YYYY-MM-DD')
+        else:
+            first_day = timezone.localdate()
+        first_day -= timedelta(days=first_day.weekday())
+        weeks = options['weeks']
+        tz = timezone.get_current_timezone()
+
+        def at(day, hour):
+            return timezone.make_aware(datetime.combine(day, time(hour)), tz)
+
+        with transaction.atomic(), journal.batch():
+            if options['flush']:
+                for model in (Schedule, Availability, PatientAvailability, Estagiario, Patient, Turma, Room):
+                    model.objects.all().delete()
+
+            rooms = [
+                Room.objects.get_or_create(
+                    name=f'Room {i + 1}', defaults={'opens_at': time(OPEN_HOUR), 'closes_at': time(CLOSE_HOUR)},
+                )[0]
+                for i in range(options['rooms'])
+            ]
+
+            turmas = Turma.objects.bulk_create([
+                Turma(
+                    name=f'Turma {i + 1}', description=SEED_TAG,
+                    start_date=first_day, end_date=first_day + timedelta(weeks=weeks, days=-1),
+                )
+                for i in range(options['turmas'])
+            ])
+            interns = Estagiario.objects.bulk_create([
+                Estagiario(first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                           email=f'intern{i + 1}@clinic.test')
+                for i in range(options['interns'])
+            ])
+            patients = Patient.objects.bulk_create([
+                Patient(first_name=rng.choice(FIRST_NAMES), last_name=rng.choice(LAST_NAMES),
+                        email=f'patient{i + 1}@clinic.test', phone=f'+55 11 9{rng.randrange(10 ** 8):08d}')
+                for i in range(options['patients'])
+            ])
+            if not interns or not patients:
+                raise CommandError('need at least one intern and one patient')
+
+            # weekly patterns: interns get 2-4 blocks of 3-5 hours, patients 1-3 blocks of 2-4 hours,
+            # at most one block per person and day so the rows are already coalesced
+            def pattern(blocks, lengths):
+                days = rng.sample(range(5), rng.randint(*blocks))
+                result = []
+                for day in sorted(days):
+                    length = rng.randint(*lengths)
+                    start = rng.randint(OPEN_HOUR, CLOSE_HOUR - length)
+                    result.append((day, start, start + length))
+                return result
+
+            intern_patterns = {intern.pk: pattern((2, 4), (3, 5)) for intern in interns}
+            patient_patterns = {patient.pk: pattern((1, 3), (2, 4)) for patient in patients}
+
+            # (resource id, hour start) already taken; bookings are whole hours, so that is all an
+            # overlap check needs (the database rejects overlaps on PostgreSQL, api/booking.py)
+            busy_rooms = set()
+            last_day = first_day + timedelta(weeks=weeks)
+            for room_id, start, end in Schedule.objects.filter(
+                room__in=rooms, start_time__lt=at(last_day, 0), end_time__gt=at(first_day, 0),
+            ).values_list('room_id', 'start_time', 'end_time'):
+                hour = timezone.localtime(start, tz).replace(minute=0, second=0, microsecond=0)
+                while hour < end:
+                    busy_rooms.add((room_id, hour))
+                    hour += timedelta(hours=1)
+            busy_patients = set()
+
+            availabilities = []
+            patient_availabilities = []
+            schedules = []
+            for week in range(weeks):
+                monday = first_day + timedelta(weeks=week)
+                for patient in patients:
+                    for day, start, end in patient_patterns[patient.pk]:
+                        d = monday + timedelta(days=day)
+                        patient_availabilities.append(
+                            PatientAvailability(patient=patient, start_date=at(d, start), end_date=at(d, end))
+                        )
+                for intern in interns:
+                    for day, start, end in intern_patterns[intern.pk]:
+                        d = monday + timedelta(days=day)
+                        availabilities.append(Availability(intern=intern, start_date=at(d, start), end_date=at(d, end)))
+                        for hour in range(start, end):
+                            if rng.random() >= options['booking_rate']:
+                                continue
+                            slot = at(d, hour)
+                            # a few draws for a patient free at that hour, then any free room
+                            patient = next(
+                                (p for p in (rng.choice(patients) for _ in range(5))
+                                 if (p.pk, slot) not in busy_patients),
+                                None,
+                            )
+                            free_rooms = [room for room in rooms if (room.pk, slot) not in busy_rooms]
+                            if patient is None or (rooms and not free_rooms):
+                                continue
+                            room = rng.choice(free_rooms) if free_rooms else None
+                            busy_patients.add((patient.pk, slot))
+                            if room is not None:
+                                busy_rooms.add((room.pk, slot))
+                            schedule = Schedule(
+                                intern=intern, patient=patient, room=room,
+                                start_time=slot, end_time=at(d, hour + 1),
+                            )
+                            schedule.search_document = build_document(schedule)
+                            schedules.append(schedule)
+
+            for model, objs in (
+                (Turma, turmas), (Estagiario, interns), (Patient, patients),
+            ):
+                bulk_saved(model, objs)
+            for model, objs in (
+                (Availability, availabilities), (PatientAvailability, patient_availabilities), (Schedule, schedules),
+            ):
+                bulk_saved(model, model.objects.bulk_create(objs, batch_size=1000))
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(turmas)} turmas, {len(interns)} interns, {len(patients)} patients, '
+            f'{len(availabilities)} availabilities, {len(patient_availabilities)} patient availabilities, '
+            f'{len(schedules)} schedules from {first_day} over {weeks} weeks'
+        ))
@@ -0,0 +1,132 @@
+import json
+import multiprocessing
+import random
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.bulk import find_overlaps
+from api.models import Estagiario, Patient, Room, Schedule
+
+STRESS_TAG = 'stress_booking'
+OPEN_HOUR = 8
+
+
+def _worker(args):
+    seed, requests, user_id, interns, patients, rooms, starts = args
+    rng = random.Random(seed)
+    client = APIClient()
+    client.force_authenticate(get_user_model().objects.get(pk=user_id))
+    statuses = Counter()
+    try:
+        for _ in range(requests):
+            start = rng.choice(starts)
+            row = {
+                'intern': rng.choice(interns),
+                'patient': rng.choice(patients),
+                'room_id': rng.choice(rooms),
+                'start_time': start.isoformat(),
+                'end_time': (start + timedelta(hours=1)).isoformat(),
+            }
+            # one request in ten goes through the bulk endpoint
+            if rng.random() < 0.1:
+                response = client.post(reverse('api:schedule-bulk'), [row], format='json')
+            else:
+                response = client.post(reverse('api:schedule-list'), row, format='json')
+            statuses[response.status_code] += 1
+    finally:
+        connection.close()
+    return statuses
+
+
+class Command(BaseCommand):
+    help = (
+        'Book the same few slots from several processes at once through the API and count double bookings '
+        '(there must be none). Uses its own interns, patients and rooms, removed afterwards unless --keep.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8, help='processes posting at the same time')
+        parser.add_argument('--requests', type=int, default=100, help='bookings attempted per worker')
+        parser.add_argument('--interns', type=int, default=3)
+        parser.add_argument('--patients', type=int, default=6)
+        parser.add_argument('--rooms', type=int, default=2)
+        parser.add_argument('--slots', type=int, default=8, help='hourly slots competed for (at most 12)')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--keep', action='store_true', help='keep the generated rows')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['requests'] < 1:
+            raise CommandError('--workers and --requests must be at least 1')
+        if not 1 <= options['slots'] <= 12:
+            raise CommandError('--slots must be between 1 and 12')
+        interns = Estagiario.objects.bulk_create([
+            Estagiario(first_name='Stress', last_name=f'Intern {n}', email=f'{STRESS_TAG}@clinic.test')
+            for n in range(options['interns'])
+        ])
+        patients = Patient.objects.bulk_create([
+            Patient(first_name='Stress', last_name=f'Patient {n}', email=f'{STRESS_TAG}@clinic.test')
+            for n in range(options['patients'])
+        ])
+        stamp = timezone.now().strftime('%Y%m%d%H%M%S%f')
+        rooms = Room.objects.bulk_create([Room(name=f'{STRESS_TAG} {stamp} {n}') for n in range(options['rooms'])])
+        user, _ = get_user_model().objects.get_or_create(username=STRESS_TAG, defaults={'is_staff': True})
+        # a day well clear of real bookings
+        day = timezone.localdate() + timedelta(days=400)
+        starts = [
+            timezone.make_aware(datetime.combine(day, datetime.min.time())) + timedelta(hours=OPEN_HOUR + n)
+            for n in range(options['slots'])
+        ]
+        jobs = [
+            (options['seed'] + n, options['requests'], user.pk, [i.pk for i in interns], [p.pk for p in patients],
+             [r.pk for r in rooms], starts)
+            for n in range(options['workers'])
+        ]
+        try:
+            with override_settings(ALLOWED_HOSTS=['testserver'], RESPONSE_CACHE=False):
+                # forked workers must not share the parent's connection
+                connections.close_all()
+                started = time.perf_counter()
+                with multiprocessing.get_context('fork').Pool(options['workers']) as pool:
+                    statuses = sum(pool.map(_worker, jobs), Counter())
+                elapsed = time.perf_counter() - started
+            report = self.report(statuses, elapsed, interns, patients, rooms)
+        finally:
+            if not options['keep']:
+                Schedule.objects.filter(intern__in=interns).delete()
+                Room.objects.filter(pk__in=[r.pk for r in rooms]).delete()
+                Estagiario.objects.filter(pk__in=[i.pk for i in interns]).delete()
+                Patient.objects.filter(pk__in=[p.pk for p in patients]).delete()
+        self.stdout.write(json.dumps(report, indent=2, sort_keys=True))
+        if sum(report['double_bookings'].values()):
+            raise CommandError('double bookings found')
+
+    def report(self, statuses, elapsed, interns, patients, rooms):
+        rows = list(
+            Schedule.objects.filter(intern__in=interns)
+            .values_list('pk', 'intern_id', 'patient_id', 'room_id', 'start_time', 'end_time')
+        )
+        double_bookings = {}
+        for index, resource in enumerate(('intern', 'patient', 'room'), start=1):
+            groups = {}
+            for row in rows:
+                if row[index] is not None:
+                    groups.setdefault(row[index], []).append((row[4], row[5], row[0]))
+            double_bookings[resource] = sum(len(find_overlaps(intervals)) for intervals in groups.values())
+        attempts = sum(statuses.values())
+        return {
+            'vendor': connection.vendor,
+            'attempts': attempts,
+            'statuses': {str(code): count for code, count in sorted(statuses.items())},
+            'booked': len(rows),
+            'writes_per_s': round(attempts / elapsed, 1),
+            'double_bookings': double_bookings,
+        }
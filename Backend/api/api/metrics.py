@@ -0,0 +1,173 @@
+"""
+Opt-in per-request instrumentation (``API_METRICS=1``).
+
+``MetricsMiddleware`` records, per route and method, the number of SQL
+queries, time spent in the database, time spent rendering the response body
+and the response size. Totals are kept in memory per process and exported in
+the Prometheus text format at ``/api/_metrics``. Each response gets a
+``Server-Timing`` header, and requests slower than ``API_METRICS_SLOW_MS`` are
+logged with their most expensive queries.
+"""
+import logging
+import threading
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+
+logger = logging.getLogger('api.metrics')
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+TOP_QUERIES = 5
+
+
+class QueryRecorder:
+    """``execute_wrapper`` hook that counts and times every query on a connection."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            self.queries.append((elapsed, sql))
+
+    def top(self, n=TOP_QUERIES):
+        return sorted(self.queries, key=lambda q: q[0], reverse=True)[:n]
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series = {}
+
+    def observe(self, route, method, status, duration, queries, db_seconds, render_seconds, size):
+        key = (route, method)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = {
+                    'requests': 0, 'errors': 0, 'queries': 0, 'db': 0.0, 'render': 0.0, 'bytes': 0,
+                    'duration': 0.0, 'buckets': [0] * len(BUCKETS),
+                }
+            series['requests'] += 1
+            if status >= 500:
+                series['errors'] += 1
+            series['queries'] += queries
+            series['db'] += db_seconds
+            series['render'] += render_seconds
+            series['bytes'] += size
+            series['duration'] += duration
+            for i, bound in enumerate(BUCKETS):
+                if duration <= bound:
+                    series['buckets'][i] += 1
+
+    def reset(self):
+        with self._lock:
+            self._series = {}
+
+    def render(self):
+        with self._lock:
+            items = sorted((key, dict(series, buckets=list(series['buckets']))) for key, series in self._series.items())
+        counters = (
+            ('api_requests_total', 'counter', 'Requests served.', 'requests'),
+            ('api_request_errors_total', 'counter', 'Requests answered with a 5xx status.', 'errors'),
+            ('api_db_queries_total', 'counter', 'SQL queries executed.', 'queries'),
+            ('api_db_seconds_total', 'counter', 'Time spent in the database.', 'db'),
+            ('api_render_seconds_total', 'counter', 'Time spent rendering response bodies.', 'render'),
+            ('api_response_bytes_total', 'counter', 'Response body bytes.', 'bytes'),
+        )
+        lines = []
+        for name, kind, doc, field in counters:
+            lines += [f'# HELP {name} {doc}', f'# TYPE {name} {kind}']
+            for (route, method), series in items:
+                lines.append(f'{name}{{{_labels(route, method)}}} {series[field]}')
+        name = 'api_request_duration_seconds'
+        lines += [f'# HELP {name} Request latency.', f'# TYPE {name} histogram']
+        for (route, method), series in items:
+            labels = _labels(route, method)
+            for bound, count in zip(BUCKETS, series['buckets']):
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {count}')
+            lines.append(f'{name}_bucket{{{labels},le="+Inf"}} {series["requests"]}')
+            lines.append(f'{name}_sum{{{labels}}} {series["duration"]}')
+            lines.append(f'{name}_count{{{labels}}} {series["requests"]}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(route, method):
+    route = route.replace('\\', '\\\\').replace('"', '\\"')
+    return f'route="{route}",method="{method}"'
+
+
+registry = Registry()
+
+
+def route_of(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_seconds = getattr(settings, 'API_METRICS_SLOW_MS', 500) / 1000
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        render_seconds = getattr(request, '_metrics_render_seconds', 0.0)
+        duration = time.perf_counter() - started
+        if response.streaming:
+            return response
+
+        size = len(response.content)
+        route = route_of(request)
+        registry.observe(route, request.method, response.status_code, duration, recorder.count,
+                         recorder.seconds, render_seconds, size)
+        response['Server-Timing'] = (
+            f'db;dur={recorder.seconds * 1000:.1f};desc="{recorder.count} queries", '
+            f'render;dur={render_seconds * 1000:.1f}, total;dur={duration * 1000:.1f}'
+        )
+        if duration >= self.slow_seconds:
+            logger.warning(
+                'slow request %s %s (%s): %.0f ms, %d queries, %.0f ms db, %d bytes\n%s',
+                request.method, request.get_full_path(), route, duration * 1000, recorder.count,
+                recorder.seconds * 1000, size,
+                '\n'.join(f'  {elapsed * 1000:.1f} ms  {sql}' for elapsed, sql in recorder.top()),
+            )
+        return response
+
+    def process_template_response(self, request, response):
+        # DRF responses are rendered after every middleware has seen them; time that step
+        started = time.perf_counter()
+
+        def rendered(response):
+            request._metrics_render_seconds = time.perf_counter() - started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def metrics_view(request):
+    # only served when the middleware is on, and only to the configured addresses
+    if not getattr(settings, 'API_METRICS', False):
+        raise Http404
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'API_METRICS_ALLOWED_IPS', ()):
+        return HttpResponse(status=403)
+    from .response_cache import stats
+    return HttpResponse(registry.render() + stats.prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,45 @@
+# Generated by Django 6.0 on 2026-10-18 08:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_patient_is_active'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='availability',
+            index=models.Index(fields=['intern', 'start_date'], name='api_avail_intern_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='availability',
+            index=models.Index(fields=['start_date', 'id'], name='api_avail_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patientavailability',
+            index=models.Index(fields=['patient', 'start_date'], name='api_pavail_patient_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='patientavailability',
+            index=models.Index(fields=['start_date', 'id'], name='api_pavail_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['intern', 'start_time'], name='api_sched_intern_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['patient', 'start_time'], name='api_sched_patient_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['room_id', 'start_time'], name='api_sched_room_start_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['start_time', 'id'], name='api_sched_start_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 6.0 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+def fill_documents(apps, schema_editor):
+    Schedule = apps.get_model('api', 'Schedule')
+    batch = []
+    for s in Schedule.objects.select_related('intern', 'patient').iterator(chunk_size=1000):
+        names = [f'{p.first_name} {p.last_name}'.strip() for p in (s.intern, s.patient)]
+        s.search_document = ' | '.join(names).lower()
+        batch.append(s)
+        if len(batch) >= 1000:
+            Schedule.objects.bulk_update(batch, ['search_document'])
+            batch = []
+    if batch:
+        Schedule.objects.bulk_update(batch, ['search_document'])
+
+
+def create_search_index(apps, schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor == 'postgresql':
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+            if cursor.fetchone() is None:
+                # contrib not installed; search falls back to an unindexed LIKE
+                return
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        schema_editor.execute(
+            'CREATE INDEX IF NOT EXISTS api_sched_search_trgm ON api_schedule '
+            'USING gin (search_document gin_trgm_ops)'
+        )
+    elif conn.vendor == 'sqlite':
+        try:
+            schema_editor.execute(
+                'CREATE VIRTUAL TABLE IF NOT EXISTS api_schedule_fts '
+                'USING fts5(search_document, tokenize="trigram")'
+            )
+        except Exception:
+            # SQLite older than 3.34 has no trigram tokenizer; search falls back to LIKE
+            return
+        schema_editor.execute(
+            'INSERT INTO api_schedule_fts (rowid, search_document) '
+            'SELECT id, search_document FROM api_schedule'
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    conn = schema_editor.connection
+    if conn.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS api_sched_search_trgm')
+    elif conn.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS api_schedule_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_schedule_range_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='schedule',
+            name='search_document',
+            field=models.TextField(blank=True, default='', editable=False),
+        ),
+        migrations.RunPython(fill_documents, migrations.RunPython.noop),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 6.0 on 2026-10-18 09:31
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_changelog'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AvailabilityRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', models.JSONField(default=list)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('interval', models.PositiveSmallIntegerField(default=1)),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('exdates', models.JSONField(blank=True, default=list)),
+                ('intern', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_rules', to='api.estagiario')),
+                ('turma', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.turma')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='PatientAvailabilityRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('weekdays', models.JSONField(default=list)),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('interval', models.PositiveSmallIntegerField(default=1)),
+                ('start_date', models.DateField(blank=True, null=True)),
+                ('end_date', models.DateField(blank=True, null=True)),
+                ('exdates', models.JSONField(blank=True, default=list)),
+                ('patient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='availability_rules', to='api.patient')),
+                ('turma', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.turma')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
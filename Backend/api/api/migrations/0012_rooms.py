@@ -0,0 +1,70 @@
+# Generated by Django 6.0 on 2026-10-18 15:03
+
+import datetime
+
+import django.db.models.deletion
+from django.core.management.color import no_style
+from django.db import migrations, models
+
+
+def create_rooms(apps, schema_editor):
+    # one Room per room number already used by bookings, keeping the number as its id; open all
+    # day so the bookings they already hold stay valid
+    Room = apps.get_model('api', 'Room')
+    Schedule = apps.get_model('api', 'Schedule')
+    numbers = (
+        Schedule.objects.exclude(room_id=None).order_by('room_id').values_list('room_id', flat=True).distinct()
+    )
+    Room.objects.bulk_create([
+        Room(id=number, name=f'Room {number}', opens_at=datetime.time(0, 0), closes_at=datetime.time(23, 59))
+        for number in numbers
+    ], batch_size=1000)
+    # explicit ids leave PostgreSQL's sequence behind
+    connection = schema_editor.connection
+    for sql in connection.ops.sequence_reset_sql(no_style(), [Room]):
+        schema_editor.execute(sql)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Room',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('capacity', models.PositiveSmallIntegerField(default=1)),
+                ('opens_at', models.TimeField(default=datetime.time(8, 0))),
+                ('closes_at', models.TimeField(default=datetime.time(20, 0))),
+                ('weekdays', models.JSONField(blank=True, default=list)),
+                ('is_active', models.BooleanField(default=True)),
+            ],
+        ),
+        migrations.RunPython(create_rooms, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='schedule',
+            name='api_sched_room_start_idx',
+        ),
+        # the integer column becomes the foreign key column, values kept
+        migrations.RenameField(
+            model_name='schedule',
+            old_name='room_id',
+            new_name='room',
+        ),
+        migrations.AlterField(
+            model_name='schedule',
+            name='room',
+            field=models.ForeignKey(
+                blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='schedules',
+                to='api.room',
+            ),
+        ),
+        migrations.AddIndex(
+            model_name='schedule',
+            index=models.Index(fields=['room', 'start_time'], name='api_sched_room_start_idx'),
+        ),
+    ]
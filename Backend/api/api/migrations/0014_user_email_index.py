@@ -0,0 +1,19 @@
+# Generated by Django 6.0 on 2026-10-18 16:40
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_token_versions'),
+        ('auth', '0012_alter_user_first_name_max_length'),
+    ]
+
+    operations = [
+        # logins look users up by LOWER(email) (api.authentication.EmailOrUsernameBackend)
+        migrations.RunSQL(
+            'CREATE INDEX api_auth_user_email_lower_idx ON auth_user (LOWER(email));',
+            'DROP INDEX api_auth_user_email_lower_idx;',
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0 on 2026-10-18 17:20
+
+from django.db import IntegrityError, migrations
+
+# kept in step with api.booking.CONSTRAINTS
+CONSTRAINTS = {
+    'api_sched_intern_no_overlap': 'intern',
+    'api_sched_patient_no_overlap': 'patient',
+    'api_sched_room_no_overlap': 'room',
+}
+
+
+def add_constraints(apps, schema_editor):
+    # PostgreSQL only: SQLite serializes booking writes instead (api/booking.py)
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist'")
+        btree_gist = cursor.fetchone() is not None
+    if btree_gist:
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+        same = '{}_id WITH ='
+    else:
+        # without btree_gist (not shipped by every build) the id becomes a one-value range, which
+        # core GiST indexes: [id, id] && [id, id] holds exactly when the ids are equal
+        same = "int8range({0}_id, {0}_id, '[]') WITH &&"
+    for name, resource in CONSTRAINTS.items():
+        try:
+            schema_editor.execute(
+                f'ALTER TABLE api_schedule ADD CONSTRAINT {name} EXCLUDE USING gist '
+                f"({same.format(resource)}, tstzrange(start_time, end_time, '[)') WITH &&) "
+                f'WHERE ({resource}_id IS NOT NULL)'
+            )
+        except IntegrityError as e:
+            raise RuntimeError(
+                f'overlapping bookings of the same {resource} exist; list them with GET /api/schedules/conflicts/ '
+                'and fix them before migrating'
+            ) from e
+
+
+def remove_constraints(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    for name in CONSTRAINTS:
+        schema_editor.execute(f'ALTER TABLE api_schedule DROP CONSTRAINT IF EXISTS {name}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_user_email_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_constraints, remove_constraints),
+    ]
@@ -1,3 +1,7 @@
+import datetime
+import secrets
+
+from django.conf import settings
 from django.db import models
 
 
@@ -6,6 +10,8 @@ class Turma(models.Model):
     description = models.TextField(blank=True)
     start_date = models.DateField(null=True, blank=True)
     end_date = models.DateField(null=True, blank=True)
+    # last change of the row; drives ETag/Last-Modified (api/conditional.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return self.name
@@ -18,6 +24,8 @@ class Patient(models.Model):
     phone = models.CharField(max_length=50, blank=True)
     # mark patient active/disabled
     is_active = models.BooleanField(default=True)
+    # last change of the row; drives ETag/Last-Modified (api/conditional.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}" if self.last_name else self.first_name
@@ -29,6 +37,8 @@ class Estagiario(models.Model):
     email = models.EmailField(blank=True)
     # mark intern active/disabled
     is_active = models.BooleanField(default=True)
+    # last change of the row; drives ETag/Last-Modified (api/conditional.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}" if self.last_name else self.first_name
@@ -40,6 +50,14 @@ class Availability(models.Model):
     # store availability with date+time so UI can pick day and start/end times
     start_date = models.DateTimeField()
     end_date = models.DateTimeField()
+    # last change of the row; drives ETag/Last-Modified (api/conditional.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['intern', 'start_date'], name='api_avail_intern_start_idx'),
+            models.Index(fields=['start_date', 'id'], name='api_avail_start_idx'),
+        ]
 
     def __str__(self):
         return f"Availability intern={self.intern_id} {self.start_date} - {self.end_date}"
@@ -51,18 +69,166 @@ class PatientAvailability(models.Model):
     # store availability with date+time so user can pick day and start/end times
     start_date = models.DateTimeField()
     end_date = models.DateTimeField()
+    # last change of the row; drives ETag/Last-Modified (api/conditional.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['patient', 'start_date'], name='api_pavail_patient_start_idx'),
+            models.Index(fields=['start_date', 'id'], name='api_pavail_start_idx'),
+        ]
 
     def __str__(self):
         return f"PatientAvailability patient={self.patient_id} {self.start_date} - {self.end_date}"
 
 
+class RecurrenceRule(models.Model):
+    # weekly pattern (RRULE FREQ=WEEKLY;INTERVAL;BYDAY) expanded on demand inside the
+    # requested window instead of being materialized as one row per occurrence
+    weekdays = models.JSONField(default=list)  # 0=Monday .. 6=Sunday
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+    interval = models.PositiveSmallIntegerField(default=1)  # every N weeks
+    # bounds; when empty the linked turma's start_date/end_date apply
+    start_date = models.DateField(null=True, blank=True)
+    end_date = models.DateField(null=True, blank=True)
+    turma = models.ForeignKey(Turma, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
+    exdates = models.JSONField(default=list, blank=True)  # skipped dates, 'YYYY-MM-DD'
+
+    class Meta:
+        abstract = True
+
+
+class AvailabilityRule(RecurrenceRule):
+    intern = models.ForeignKey(Estagiario, related_name='availability_rules', on_delete=models.CASCADE)
+
+    def __str__(self):
+        return f"AvailabilityRule intern={self.intern_id} {self.weekdays} {self.start_time}-{self.end_time}"
+
+
+class PatientAvailabilityRule(RecurrenceRule):
+    patient = models.ForeignKey(Patient, related_name='availability_rules', on_delete=models.CASCADE)
+
+    def __str__(self):
+        return f"PatientAvailabilityRule patient={self.patient_id} {self.weekdays} {self.start_time}-{self.end_time}"
+
+
+class Room(models.Model):
+    name = models.CharField(max_length=100, unique=True)
+    capacity = models.PositiveSmallIntegerField(default=1)
+    # opening hours in local time, on the listed weekdays (0=Monday .. 6=Sunday; empty means every day)
+    opens_at = models.TimeField(default=datetime.time(8, 0))
+    closes_at = models.TimeField(default=datetime.time(20, 0))
+    weekdays = models.JSONField(default=list, blank=True)
+    is_active = models.BooleanField(default=True)
+    # last change of the row; room names appear in calendar feeds (api/feeds.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    def __str__(self):
+        return self.name
+
+
 class Schedule(models.Model):
     # schedule ties an intern to a patient at a specific datetime range (a booking)
     intern = models.ForeignKey(Estagiario, related_name='schedules', on_delete=models.CASCADE)
     patient = models.ForeignKey(Patient, related_name='schedules', on_delete=models.CASCADE)
-    room_id = models.IntegerField(null=True, blank=True)
+    # bookings keep their room; deactivate a room instead of deleting it
+    room = models.ForeignKey(Room, null=True, blank=True, on_delete=models.PROTECT, related_name='schedules')
     start_time = models.DateTimeField()
     end_time = models.DateTimeField()
+    # lowercased intern/patient names, maintained by signals and indexed by the search backend
+    search_document = models.TextField(blank=True, default='', editable=False)
+    # last change of the row; drives ETag/Last-Modified (api/conditional.py)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+
+    class Meta:
+        # composite (resource, start) indexes serve the range filters and overlap checks
+        indexes = [
+            models.Index(fields=['intern', 'start_time'], name='api_sched_intern_start_idx'),
+            models.Index(fields=['patient', 'start_time'], name='api_sched_patient_start_idx'),
+            models.Index(fields=['room', 'start_time'], name='api_sched_room_start_idx'),
+            models.Index(fields=['start_time', 'id'], name='api_sched_start_idx'),
+        ]
+        # on PostgreSQL, overlapping bookings of the same intern, patient or room are also rejected by
+        # exclusion constraints (migration 0015, api/booking.py); they aren't declared here because SQLite has none
 
     def __str__(self):
         return f"Schedule intern={self.intern_id} patient={self.patient_id} {self.start_time} - {self.end_time}"
+
+
+class ChangeLogEntry(models.Model):
+    # append-only journal of writes to the scheduling models; the auto id is the
+    # monotonically increasing version handed to clients as their sync token
+    UPSERT = 'u'
+    DELETE = 'd'
+    OPS = ((UPSERT, 'upsert'), (DELETE, 'delete'))
+
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    op = models.CharField(max_length=1, choices=OPS)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'id'], name='api_changelog_model_idx'),
+        ]
+
+    def __str__(self):
+        return f"ChangeLogEntry v{self.pk} {self.op} {self.model}={self.object_id}"
+
+
+class CascadeJob(models.Model):
+    # background removal of a deactivated patient's/intern's future rows, done in chunks
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = ((PENDING, 'pending'), (RUNNING, 'running'), (DONE, 'done'), (FAILED, 'failed'))
+
+    model = models.CharField(max_length=50)
+    object_id = models.BigIntegerField()
+    # rows starting after this instant are removed
+    cutoff = models.DateTimeField()
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    total = models.PositiveIntegerField(default=0)
+    done = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"CascadeJob {self.pk} {self.model}={self.object_id} {self.status} {self.done}/{self.total}"
+
+
+class TokenVersion(models.Model):
+    # access/refresh tokens carry the version they were issued with; bumping it revokes them all
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, primary_key=True, on_delete=models.CASCADE, related_name='token_version',
+    )
+    version = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return f"TokenVersion user={self.user_id} v{self.version}"
+
+
+def _feed_secret():
+    return secrets.token_urlsafe(32)
+
+
+class FeedToken(models.Model):
+    # secret URL of an iCalendar feed of one intern's, patient's or room's bookings (api/feeds.py)
+    INTERN = 'intern'
+    PATIENT = 'patient'
+    ROOM = 'room'
+    RESOURCES = ((INTERN, 'intern'), (PATIENT, 'patient'), (ROOM, 'room'))
+
+    token = models.CharField(max_length=64, unique=True, default=_feed_secret, editable=False)
+    resource = models.CharField(max_length=10, choices=RESOURCES)
+    object_id = models.BigIntegerField()
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True, on_delete=models.CASCADE, related_name='feed_tokens',
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"FeedToken {self.pk} {self.resource}={self.object_id}"
@@ -0,0 +1,20 @@
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class StartTimeCursorPagination(CursorPagination):
+    # keyset pagination: deep pages cost the same as the first one
+    ordering = ('start_time', 'id')
+    page_size = 200
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class StartDateCursorPagination(StartTimeCursorPagination):
+    ordering = ('start_date', 'id')
+
+
+class OptionalPageNumberPagination(PageNumberPagination):
+    # unpaginated unless the client asks for ?page_size=
+    page_size = None
+    page_size_query_param = 'page_size'
+    max_page_size = 500
@@ -0,0 +1,71 @@
+"""
+Lazy expansion of recurring availability rules.
+
+Rules are only turned into concrete (start, end) intervals for the days that
+fall inside the requested window, so a semester-long weekly pattern costs one
+row in storage and a handful of intervals per week view.
+"""
+from datetime import date, datetime, timedelta
+
+from django.db.models import Q
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+# week parity for rules without any start bound is counted from this Monday
+EPOCH_MONDAY = date(1970, 1, 5)
+
+
+def rule_bounds(rule):
+    start = rule.start_date or (rule.turma.start_date if rule.turma_id else None)
+    end = rule.end_date or (rule.turma.end_date if rule.turma_id else None)
+    return start, end
+
+
+def expand(rule, start, end):
+    """Yield aware (start, end) occurrences of ``rule`` overlapping [start, end)."""
+    first, last = rule_bounds(rule)
+    tz = timezone.get_current_timezone()
+    # an occurrence starting the day before may still reach into the window
+    day = timezone.localtime(start, tz).date() - timedelta(days=1)
+    stop = timezone.localtime(end, tz).date()
+    if first is not None and first > day:
+        day = first
+    if last is not None and last < stop:
+        stop = last
+    weekdays = set(rule.weekdays)
+    exdates = set(rule.exdates or ())
+    anchor = first or EPOCH_MONDAY
+    anchor_monday = anchor - timedelta(days=anchor.weekday())
+    interval = max(rule.interval or 1, 1)
+    while day <= stop:
+        if day.weekday() in weekdays and day.isoformat() not in exdates:
+            week = (day - anchor_monday).days // 7
+            if week % interval == 0:
+                occ_start = timezone.make_aware(datetime.combine(day, rule.start_time), tz)
+                occ_end = timezone.make_aware(datetime.combine(day, rule.end_time), tz)
+                if occ_start < end and occ_end > start:
+                    yield occ_start, occ_end
+        day += timedelta(days=1)
+
+
+def rules_in_window(queryset, start, end):
+    """Narrow a rule queryset to rules whose (possibly turma-derived) bounds meet the window."""
+    first_day = timezone.localtime(start).date() - timedelta(days=1)
+    last_day = timezone.localtime(end).date()
+    return (
+        queryset.select_related('turma')
+        .annotate(
+            effective_start=Coalesce('start_date', 'turma__start_date'),
+            effective_end=Coalesce('end_date', 'turma__end_date'),
+        )
+        .filter(Q(effective_start__isnull=True) | Q(effective_start__lte=last_day))
+        .filter(Q(effective_end__isnull=True) | Q(effective_end__gte=first_day))
+    )
+
+
+def expand_rules(queryset, owner_field, start, end):
+    """Yield (owner_id, start, end, rule_id) for every occurrence of the rules in the window."""
+    attname = f'{owner_field}_id'
+    for rule in rules_in_window(queryset, start, end):
+        for occ_start, occ_end in expand(rule, start, end):
+            yield getattr(rule, attname), occ_start, occ_end, rule.pk
@@ -0,0 +1,33 @@
+"""
+JSON renderer that uses ``orjson`` when it is installed.
+
+The bytes are the same as ``rest_framework.renderers.JSONRenderer`` produces
+for compact output: types orjson would format differently (datetimes, dates,
+times, decimals, lazy strings) are handed to DRF's encoder, and U+2028/U+2029
+are escaped the same way. Indented output (the browsable API) and anything
+orjson refuses go through the stock renderer.
+"""
+from rest_framework import renderers
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None or self.ensure_ascii or not self.compact
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self.encoder_class().default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        except (orjson.JSONEncodeError, TypeError):
+            return super().render(data, accepted_media_type, renderer_context)
+        return ret.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
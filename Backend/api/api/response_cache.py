@@ -0,0 +1,209 @@
+"""
+Versioned response cache for the read endpoints.
+
+Cache keys combine the request (path, query string, host, accepted media
+type) with version counters kept in the Django cache:
+
+* ``rc:v:<model>`` is bumped by every change to the model;
+* for the time-based models, ``rc:v:<model>:<YYYY-MM-DD>`` is bumped for each
+  UTC day a changed row covers (before and after the change), and
+  ``rc:v:<model>:undated`` when the days aren't known (deletes by id).
+
+Date-windowed lists depend only on the counters of their days, so a booking
+next month doesn't evict this week. Counters are bumped from the save/delete
+signals and from ``bulk_saved``/``bulk_deleted`` (bulk endpoints, soft-delete
+cascades, coalescing), after the transaction commits. Responses carry an
+``ETag`` derived from the key, and ``If-None-Match`` is answered with a 304
+without touching the database.
+"""
+import hashlib
+import threading
+import time
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import HttpResponse, JsonResponse
+from rest_framework.response import Response
+
+TIME_FIELDS = {
+    'schedule': ('start_time', 'end_time'),
+    'availability': ('start_date', 'end_date'),
+    'patientavailability': ('start_date', 'end_date'),
+}
+# wider windows (or changes) fall back to the model-wide counter
+MAX_DAYS = 120
+
+
+def key_any(model):
+    return f'rc:v:{model}'
+
+
+def key_undated(model):
+    return f'rc:v:{model}:undated'
+
+
+def key_day(model, day):
+    return f'rc:v:{model}:{day.isoformat()}'
+
+
+def _fresh():
+    # missing counters (never set, or evicted) restart from the clock, never from a value used before
+    return time.time_ns() // 1000
+
+
+def days_between(start, end):
+    """UTC days touched by [start, end), or None when unbounded or too wide."""
+    if start is None or end is None or end <= start:
+        return None
+    first = start.astimezone(dt_timezone.utc).date()
+    last = (end - timedelta(microseconds=1)).astimezone(dt_timezone.utc).date()
+    if (last - first).days > MAX_DAYS:
+        return None
+    return [first + timedelta(days=offset) for offset in range((last - first).days + 1)]
+
+
+def read_versions(keys):
+    """{key: version} for the counters in ``keys``, starting the missing ones."""
+    keys = list(dict.fromkeys(keys))
+    found = cache.get_many(keys)
+    missing = [key for key in keys if key not in found]
+    if missing:
+        for key in missing:
+            cache.add(key, _fresh(), None)
+        found.update(cache.get_many(missing))
+    return {key: found.get(key) for key in keys}
+
+
+def _bump(keys):
+    for key in keys:
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, _fresh(), None)
+
+
+def changed(model, objs=None):
+    """Invalidate cached responses that depend on ``objs`` (instances of ``model``; None if unknown)."""
+    name = model._meta.model_name
+    keys = {key_any(name)}
+    fields = TIME_FIELDS.get(name)
+    if fields:
+        for obj in objs if objs is not None else [None]:
+            spans = [tuple(getattr(obj, f, None) for f in fields)]
+            original = getattr(obj, '_rc_span', None)
+            if original and any(original):
+                spans.append(original)
+            for span in spans:
+                days = days_between(*span)
+                if days is None:
+                    # deletes by id and partial instances can't tell which days they touched
+                    keys.add(key_undated(name))
+                else:
+                    keys.update(key_day(name, day) for day in days)
+    transaction.on_commit(lambda: _bump(keys))
+
+
+def remember_span(sender, instance, **kwargs):
+    # post_init: the times a row had when loaded, so moving it also invalidates its old days
+    fields = TIME_FIELDS[sender._meta.model_name]
+    instance._rc_span = tuple(getattr(instance, f, None) for f in fields)
+
+
+class Stats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def count(self, route, outcome):
+        with self._lock:
+            counts = self._counts.setdefault(route, {'hit': 0, 'miss': 0, 'not_modified': 0})
+            counts[outcome] += 1
+
+    def snapshot(self):
+        with self._lock:
+            result = {}
+            for route, counts in sorted(self._counts.items()):
+                total = sum(counts.values())
+                served = counts['hit'] + counts['not_modified']
+                result[route] = {**counts, 'hit_ratio': round(served / total, 4) if total else 0.0}
+            return result
+
+    def prometheus(self):
+        lines = ['# HELP api_response_cache_total Cacheable reads by outcome.',
+                 '# TYPE api_response_cache_total counter']
+        for route, counts in self.snapshot().items():
+            for outcome in ('hit', 'miss', 'not_modified'):
+                lines.append(f'api_response_cache_total{{route="{route}",outcome="{outcome}"}} {counts[outcome]}')
+        return '\n'.join(lines) + '\n'
+
+
+stats = Stats()
+
+
+class CachedResponseMixin:
+    """
+    Cache ``list``/``retrieve`` responses. ``cache_depends_on`` names other
+    models whose changes show up in the rows (e.g. embedded names).
+    """
+    cache_depends_on = ()
+
+    def cache_version_keys(self):
+        model = self.queryset.model._meta.model_name
+        keys = [key_any(name) for name in self.cache_depends_on]
+        days = None
+        if self.action == 'list' and model in TIME_FIELDS and hasattr(self, 'parse_window'):
+            start, end, _ = self.parse_window()
+            days = days_between(start, end)
+        if days is None:
+            keys.append(key_any(model))
+        else:
+            keys.append(key_undated(model))
+            keys.extend(key_day(model, day) for day in days)
+        return keys
+
+    def _cached(self, request, produce):
+        if not getattr(settings, 'RESPONSE_CACHE', True) or request.method != 'GET':
+            return produce()
+        route = f'{self.basename}-{self.action}'
+        versions = read_versions(self.cache_version_keys())
+        raw = '|'.join([
+            route, request.get_host(), request.get_full_path(),
+            getattr(request, 'accepted_media_type', '') or '', getattr(self, 'row_etag', ''),
+            *map(str, versions.values()),
+        ])
+        digest = hashlib.sha1(raw.encode()).hexdigest()
+        headers = {'Cache-Control': 'private, no-cache'}
+        # with ConditionalGetMixin in front the validators come from the rows instead
+        if not getattr(self, 'row_validators', False):
+            etag = f'"{digest}"'
+            headers['ETag'] = etag
+            if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+                stats.count(route, 'not_modified')
+                return Response(status=304, headers=headers)
+        key = f'rc:r:{digest}'
+        entry = cache.get(key)
+        if entry is not None:
+            stats.count(route, 'hit')
+            return Response(entry, headers={**headers, 'X-Cache': 'HIT'})
+        stats.count(route, 'miss')
+        response = produce()
+        if response.status_code == 200:
+            cache.set(key, response.data, getattr(settings, 'RESPONSE_CACHE_SECONDS', 300))
+            for name, value in {**headers, 'X-Cache': 'MISS'}.items():
+                response[name] = value
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._cached(request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._cached(request, lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs))
+
+
+def cache_stats_view(request):
+    # hit ratios per route since the process started, for the same addresses as /api/_metrics
+    if request.META.get('REMOTE_ADDR') not in getattr(settings, 'API_METRICS_ALLOWED_IPS', ()):
+        return HttpResponse(status=403)
+    return JsonResponse(stats.snapshot())
@@ -0,0 +1,60 @@
+"""
+Room inventory lookups.
+
+A room is free when it is open (its opening hours on its weekdays, in local
+time) and not booked. Free time over a window is the opening intervals minus
+the bookings fetched with one range query on the (room, start_time) index.
+"""
+from datetime import datetime, timedelta
+
+from django.utils import timezone
+
+from .models import Room, Schedule
+from .slots import merge_intervals, subtract_intervals
+
+
+def opening_intervals(room, start, end):
+    """The room's opening hours between ``start`` and ``end`` as sorted aware intervals."""
+    intervals = []
+    day = timezone.localtime(start).date()
+    last = timezone.localtime(end).date()
+    tz = timezone.get_current_timezone()
+    while day <= last:
+        if not room.weekdays or day.weekday() in room.weekdays:
+            opens = timezone.make_aware(datetime.combine(day, room.opens_at), tz)
+            closes = timezone.make_aware(datetime.combine(day, room.closes_at), tz)
+            if opens < end and closes > start and closes > opens:
+                intervals.append((max(opens, start), min(closes, end)))
+        day += timedelta(days=1)
+    return intervals
+
+
+def is_open(room, start, end):
+    return any(s <= start and end <= e for s, e in opening_intervals(room, start, end))
+
+
+def free_intervals(rooms, start, end):
+    """{room id: free intervals} for ``rooms`` between ``start`` and ``end``."""
+    rooms = list(rooms)
+    busy = {}
+    for room_id, s, e in (
+        Schedule.objects.filter(room__in=rooms, start_time__lt=end, end_time__gt=start)
+        .order_by('room_id', 'start_time').values_list('room_id', 'start_time', 'end_time')
+    ):
+        busy.setdefault(room_id, []).append((s, e))
+    return {
+        room.pk: subtract_intervals(opening_intervals(room, start, end), merge_intervals(busy.get(room.pk, [])))
+        for room in rooms
+    }
+
+
+def pick_room(start, end, capacity=1, exclude=None):
+    """The first active room open and unbooked for [start, end), or None."""
+    booked = set(
+        Schedule.objects.filter(room__isnull=False, start_time__lt=end, end_time__gt=start)
+        .exclude(pk=exclude).values_list('room_id', flat=True)
+    )
+    for room in Room.objects.filter(is_active=True, capacity__gte=capacity).order_by('id'):
+        if room.pk not in booked and is_open(room, start, end):
+            return room
+    return None
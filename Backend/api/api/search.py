@@ -0,0 +1,136 @@
+"""
+Search backends for the schedule ``q`` filter.
+
+Every schedule carries a lowercased ``search_document`` with the intern and
+patient names. The backend picked for the active database indexes that
+document so substring searches don't scan the table:
+
+* PostgreSQL: a ``pg_trgm`` GIN index on the column, queried with ``LIKE``.
+* SQLite: an FTS5 table using the trigram tokenizer, kept in sync by signals.
+* anything else: a plain ``LIKE`` over the document column.
+
+Room numbers and names are matched exactly, never by substring.
+"""
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import Room
+
+FTS_TABLE = 'api_schedule_fts'
+# the trigram tokenizer can't match anything shorter than one trigram
+FTS_MIN_QUERY = 3
+# largest value of the Room id column (BigAutoField)
+MAX_ROOM_ID = 2 ** 63 - 1
+
+
+def person_name(person):
+    if person is None:
+        return ''
+    return f'{person.first_name} {person.last_name}'.strip()
+
+
+def build_document(schedule):
+    intern = schedule.intern if schedule.intern_id else None
+    patient = schedule.patient if schedule.patient_id else None
+    return f'{person_name(intern)} | {person_name(patient)}'.lower()
+
+
+class BasicSearchBackend:
+    """Unindexed fallback: LIKE over the denormalized document."""
+
+    def text_filter(self, text):
+        return Q(search_document__contains=text)
+
+    def filter(self, qs, q):
+        text = q.strip().lower()
+        if not text:
+            return qs
+        cond = self.text_filter(text)
+        # isdigit() also admits superscripts and circled digits, which int() rejects;
+        # ids past the bigint column can't match and would overflow the query
+        if text.isdecimal() and int(text) <= MAX_ROOM_ID:
+            cond |= Q(room_id=int(text))
+        else:
+            # whole room names, case-insensitively
+            cond |= Q(room__in=Room.objects.filter(name__iexact=text).values('id'))
+        return qs.filter(cond)
+
+    def index(self, rows):
+        # rows are (id, document) pairs
+        pass
+
+    def remove(self, ids):
+        pass
+
+
+class TrigramSearchBackend(BasicSearchBackend):
+    # the GIN gin_trgm_ops index created in migrations serves LIKE '%text%' directly
+    pass
+
+
+class Fts5SearchBackend(BasicSearchBackend):
+    """FTS5 shadow table with the trigram tokenizer (substring semantics, like pg_trgm)."""
+
+    def text_filter(self, text):
+        if len(text) < FTS_MIN_QUERY:
+            return super().text_filter(text)
+        phrase = '"' + text.replace('"', '""') + '"'
+        return Q(pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [phrase]))
+
+    def index(self, rows):
+        rows = list(rows)
+        if not rows:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk, _ in rows])
+            cursor.executemany(f'INSERT INTO {FTS_TABLE} (rowid, search_document) VALUES (%s, %s)', rows)
+
+    def remove(self, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        with connection.cursor() as cursor:
+            cursor.executemany(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [(pk,) for pk in ids])
+
+
+BACKENDS_BY_VENDOR = {
+    'postgresql': TrigramSearchBackend,
+    'sqlite': Fts5SearchBackend,
+}
+
+_backend = None
+
+
+def get_search_backend():
+    # SCHEDULE_SEARCH_BACKEND (dotted path) overrides the per-vendor default
+    global _backend
+    if _backend is None:
+        path = getattr(settings, 'SCHEDULE_SEARCH_BACKEND', None)
+        if path:
+            cls = import_string(path)
+        else:
+            cls = BACKENDS_BY_VENDOR.get(connection.vendor, BasicSearchBackend)
+            # SQLite builds without FTS5 trigram support skip the shadow table in migrations
+            if cls is Fts5SearchBackend and FTS_TABLE not in connection.introspection.table_names():
+                cls = BasicSearchBackend
+        _backend = cls()
+    return _backend
+
+
+def refresh_documents(schedules):
+    """Recompute and store the search document of the given schedules (a queryset)."""
+    from .models import Schedule
+
+    changed = []
+    for schedule in schedules.select_related('intern', 'patient').iterator(chunk_size=1000):
+        doc = build_document(schedule)
+        if doc != schedule.search_document:
+            schedule.search_document = doc
+            changed.append(schedule)
+    if changed:
+        Schedule.objects.bulk_update(changed, ['search_document'], batch_size=1000)
+        get_search_backend().index((s.pk, s.search_document) for s in changed)
+    return len(changed)
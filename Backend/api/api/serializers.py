@@ -1,6 +1,28 @@
 from django.contrib.auth import get_user_model
+from django.urls import reverse
 from rest_framework import serializers
-from .models import Turma, Patient, Estagiario, Availability, Schedule, PatientAvailability
+from .booking import BookingConflict, overlapping_bookings
+from .feeds import RESOURCE_MODELS
+from .rooms import is_open, pick_room
+from .sparse import SparseFieldsMixin
+from .models import (
+    Turma, Patient, Estagiario, Availability, Schedule, PatientAvailability, AvailabilityRule, PatientAvailabilityRule,
+    CascadeJob, FeedToken, Room,
+)
+
+
+class PrefetchedPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    # bulk requests preload related rows into context['prefetched'][Model] to skip a query per row
+    def to_internal_value(self, data):
+        cache = self.context.get('prefetched', {}).get(self.get_queryset().model)
+        if cache is None:
+            return super().to_internal_value(data)
+        try:
+            return cache[int(data)]
+        except KeyError:
+            self.fail('does_not_exist', pk_value=data)
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -40,32 +62,215 @@ class TurmaSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'description', 'start_date', 'end_date')
 
 
-class PatientSerializer(serializers.ModelSerializer):
+class PatientSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Patient
         fields = ('id', 'first_name', 'last_name', 'email', 'phone', 'is_active')
 
 
-class EstagiarioSerializer(serializers.ModelSerializer):
+class EstagiarioSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Estagiario
         fields = ('id', 'first_name', 'last_name', 'email', 'is_active')
 
 
-class AvailabilitySerializer(serializers.ModelSerializer):
+class AvailabilitySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    intern = PrefetchedPrimaryKeyRelatedField(queryset=Estagiario.objects.all())
+    expandable_fields = ('intern',)
+
     class Meta:
         model = Availability
         fields = ('id', 'intern', 'start_date', 'end_date')
 
 
-class ScheduleSerializer(serializers.ModelSerializer):
+class RoomSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Room
+        fields = ('id', 'name', 'capacity', 'opens_at', 'closes_at', 'weekdays', 'is_active')
+
+    def validate_weekdays(self, value):
+        if not isinstance(value, list) or any(not isinstance(d, int) or not 0 <= d <= 6 for d in value):
+            raise serializers.ValidationError('weekdays must be a list of integers 0 (Monday) to 6 (Sunday)')
+        return sorted(set(value))
+
+    def validate(self, attrs):
+        opens = attrs.get('opens_at', getattr(self.instance, 'opens_at', None))
+        closes = attrs.get('closes_at', getattr(self.instance, 'closes_at', None))
+        if opens is not None and closes is not None and closes <= opens:
+            raise serializers.ValidationError({'closes_at': 'closes_at must be after opens_at'})
+        return attrs
+
+
+class ScheduleSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    intern = PrefetchedPrimaryKeyRelatedField(queryset=Estagiario.objects.all())
+    patient = PrefetchedPrimaryKeyRelatedField(queryset=Patient.objects.all())
+    # kept as room_id in the API, now a key into the room inventory
+    room_id = PrefetchedPrimaryKeyRelatedField(
+        source='room', queryset=Room.objects.all(), allow_null=True, required=False,
+    )
+    # with no room given, book the first open and free one
+    auto_room = serializers.BooleanField(write_only=True, default=False)
+    expandable_fields = ('intern', 'patient')
+
     class Meta:
         model = Schedule
-        fields = ('id', 'intern', 'patient', 'room_id', 'start_time', 'end_time')
+        fields = ('id', 'intern', 'patient', 'room_id', 'start_time', 'end_time', 'auto_room')
+
+    def validate(self, attrs):
+        # merge with the current row so partial updates are checked as a whole
+        instance = self.instance
+        auto_room = attrs.pop('auto_room', False)
+        intern = attrs['intern'] if 'intern' in attrs else getattr(instance, 'intern', None)
+        patient = attrs['patient'] if 'patient' in attrs else getattr(instance, 'patient', None)
+        if 'room' in attrs:
+            room = attrs['room']
+        else:
+            room = instance.room if getattr(instance, 'room_id', None) is not None else None
+        room_id = room.pk if room is not None else None
+        start = attrs.get('start_time', getattr(instance, 'start_time', None))
+        end = attrs.get('end_time', getattr(instance, 'end_time', None))
+        if start is None or end is None:
+            return attrs
+        if end <= start:
+            raise serializers.ValidationError({'end_time': 'end_time must be after start_time'})
+        # opening hours bind new bookings and moves; editing only the people keeps a booking where it is
+        moved = instance is None or room_id != instance.room_id or (start, end) != (
+            instance.start_time, instance.end_time,
+        )
+        if moved and room is not None and not (room.is_active and is_open(room, start, end)):
+            raise serializers.ValidationError({'room_id': f'{room} is not open for the whole booking'})
+        if auto_room and room_id is None:
+            if self.context.get('bulk'):
+                raise serializers.ValidationError({'auto_room': 'not supported in bulk requests'})
+            room = pick_room(start, end, exclude=getattr(instance, 'pk', None))
+            if room is None:
+                raise serializers.ValidationError({'room_id': 'no room is free for this period'})
+            attrs['room'] = room
+            room_id = room.pk
+        if self.context.get('bulk'):
+            # bulk writes check the whole batch against existing rows in one sweep
+            return attrs
+        conflicts = overlapping_bookings(
+            start, end,
+            intern=intern.pk if intern else None,
+            patient=patient.pk if patient else None,
+            room=room_id,
+            exclude=getattr(instance, 'pk', None),
+        )
+        if conflicts:
+            raise BookingConflict({
+                'non_field_errors': [f'{resource} already booked in this period' for resource in conflicts],
+                'conflicts': conflicts,
+            })
+        return attrs
+
 
+class PatientAvailabilitySerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    patient = PrefetchedPrimaryKeyRelatedField(queryset=Patient.objects.all())
+    expandable_fields = ('patient',)
 
-class PatientAvailabilitySerializer(serializers.ModelSerializer):
     class Meta:
         model = PatientAvailability
         fields = ('id', 'patient', 'start_date', 'end_date')
         # DRF will map DateTimeField automatically; keep ISO format in/out
+
+
+class RecurrenceRuleSerializer(serializers.ModelSerializer):
+    weekdays = serializers.ListField(child=serializers.IntegerField(min_value=0, max_value=6), allow_empty=False)
+    exdates = serializers.ListField(child=serializers.DateField(), required=False)
+    interval = serializers.IntegerField(min_value=1, max_value=52, required=False)
+
+    rule_fields = ('weekdays', 'start_time', 'end_time', 'interval', 'start_date', 'end_date', 'turma', 'exdates')
+
+    def validate(self, attrs):
+        instance = self.instance
+        start = attrs.get('start_time', getattr(instance, 'start_time', None))
+        end = attrs.get('end_time', getattr(instance, 'end_time', None))
+        if start is not None and end is not None and end <= start:
+            raise serializers.ValidationError({'end_time': 'end_time must be after start_time'})
+        first = attrs.get('start_date', getattr(instance, 'start_date', None))
+        last = attrs.get('end_date', getattr(instance, 'end_date', None))
+        if first is not None and last is not None and last < first:
+            raise serializers.ValidationError({'end_date': 'end_date must not be before start_date'})
+        # stored as JSON
+        if 'weekdays' in attrs:
+            attrs['weekdays'] = sorted(set(attrs['weekdays']))
+        if 'exdates' in attrs:
+            attrs['exdates'] = sorted({d.isoformat() for d in attrs['exdates']})
+        return attrs
+
+
+class AvailabilityRuleSerializer(RecurrenceRuleSerializer):
+    class Meta:
+        model = AvailabilityRule
+        fields = ('id', 'intern') + RecurrenceRuleSerializer.rule_fields
+
+
+class PatientAvailabilityRuleSerializer(RecurrenceRuleSerializer):
+    class Meta:
+        model = PatientAvailabilityRule
+        fields = ('id', 'patient') + RecurrenceRuleSerializer.rule_fields
+
+
+class CascadeJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = CascadeJob
+        fields = ('id', 'model', 'object_id', 'cutoff', 'status', 'total', 'done', 'error', 'created_at', 'finished_at')
+        read_only_fields = fields
+
+
+class FeedTokenSerializer(serializers.ModelSerializer):
+    # the subscription URL is the secret; anyone holding it can read the feed
+    url = serializers.SerializerMethodField()
+
+    class Meta:
+        model = FeedToken
+        fields = ('id', 'resource', 'object_id', 'token', 'url', 'created_at')
+        read_only_fields = ('token', 'created_at')
+
+    def get_url(self, obj):
+        path = reverse('calendar_feed', args=[obj.token])
+        request = self.context.get('request')
+        return request.build_absolute_uri(path) if request is not None else path
+
+    def validate(self, attrs):
+        if not RESOURCE_MODELS[attrs['resource']].objects.filter(pk=attrs['object_id']).exists():
+            raise serializers.ValidationError({'object_id': f"no {attrs['resource']} with this id"})
+        return attrs
+
+
+class AutoScheduleDemandSerializer(serializers.Serializer):
+    patient = serializers.PrimaryKeyRelatedField(queryset=Patient.objects.filter(is_active=True))
+    sessions_per_week = serializers.IntegerField(min_value=1, max_value=14)
+
+
+class AutoScheduleSerializer(serializers.Serializer):
+    # input of POST /api/schedules/auto/ (see autoschedule.py)
+    patients = AutoScheduleDemandSerializer(many=True, allow_empty=False)
+    turma = serializers.PrimaryKeyRelatedField(queryset=Turma.objects.all(), required=False)
+    start = serializers.DateField(required=False)
+    end = serializers.DateField(required=False)
+    interns = serializers.ListField(child=serializers.IntegerField(), required=False)
+    rooms = serializers.ListField(child=serializers.IntegerField(), required=False)
+    slot_minutes = serializers.IntegerField(min_value=5, max_value=24 * 60, default=60)
+    max_per_day = serializers.IntegerField(min_value=1, max_value=24, default=1)
+    time_limit = serializers.FloatField(min_value=0.1, max_value=60, default=5.0)
+    commit = serializers.BooleanField(default=False)
+
+    MAX_DAYS = 200
+
+    def validate(self, attrs):
+        # the turma's dates fill in a missing start/end, so a whole cohort semester is one request
+        turma = attrs.get('turma')
+        start = attrs.get('start') or (turma and turma.start_date)
+        end = attrs.get('end') or (turma and turma.end_date)
+        if not start or not end:
+            raise serializers.ValidationError({'start': 'start and end (or a turma with dates) are required'})
+        if end < start or (end - start).days >= self.MAX_DAYS:
+            raise serializers.ValidationError({'end': f'date range must be positive and at most {self.MAX_DAYS} days'})
+        patients = [row['patient'].pk for row in attrs['patients']]
+        if len(set(patients)) != len(patients):
+            raise serializers.ValidationError({'patients': 'each patient may appear once'})
+        attrs['start'], attrs['end'] = start, end
+        return attrs
+
@@ -0,0 +1,97 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_init, post_save, pre_save
+from django.dispatch import receiver
+
+from . import journal, response_cache
+from .authentication import forget_user
+from .interval_index import schedule_index
+from .models import (
+    Availability, AvailabilityRule, Estagiario, Patient, PatientAvailability, PatientAvailabilityRule, Room, Schedule,
+    TokenVersion, Turma,
+)
+from .search import build_document, get_search_backend, refresh_documents
+
+NAME_FIELDS = {'first_name', 'last_name'}
+JOURNALED_MODELS = (
+    Turma, Patient, Estagiario, Availability, PatientAvailability, Schedule, AvailabilityRule, PatientAvailabilityRule,
+    Room,
+)
+
+
+def journal_saved(sender, instance, **kwargs):
+    journal.record_upserts(sender, [instance.pk])
+    response_cache.changed(sender, [instance])
+
+
+def journal_deleted(sender, instance, **kwargs):
+    journal.record_deletes(sender, [instance.pk])
+    response_cache.changed(sender, [instance])
+
+
+for _model in JOURNALED_MODELS:
+    post_save.connect(journal_saved, sender=_model, dispatch_uid=f'journal_saved_{_model.__name__}')
+    post_delete.connect(journal_deleted, sender=_model, dispatch_uid=f'journal_deleted_{_model.__name__}')
+
+for _model in (Availability, PatientAvailability, Schedule):
+    post_init.connect(response_cache.remember_span, sender=_model, dispatch_uid=f'remember_span_{_model.__name__}')
+
+
+@receiver(pre_save, sender=Schedule)
+def schedule_search_document(sender, instance, **kwargs):
+    instance.search_document = build_document(instance)
+
+
+@receiver(post_save, sender=Schedule)
+def schedule_saved(sender, instance, **kwargs):
+    get_search_backend().index([(instance.pk, instance.search_document)])
+    # keep the in-memory overlap index in step with committed bookings
+    transaction.on_commit(lambda: schedule_index.upsert(instance), using=kwargs.get('using'))
+
+
+@receiver(post_delete, sender=Schedule)
+def schedule_deleted(sender, instance, **kwargs):
+    pk = instance.pk
+    get_search_backend().remove([pk])
+    transaction.on_commit(lambda: schedule_index.discard(pk), using=kwargs.get('using'))
+
+
+@receiver(post_save, sender=Patient)
+@receiver(post_save, sender=Estagiario)
+def person_renamed(sender, instance, created, update_fields=None, **kwargs):
+    # names are denormalized into the schedules' search documents
+    if created or (update_fields is not None and not NAME_FIELDS & set(update_fields)):
+        return
+    field = 'patient' if sender is Patient else 'intern'
+    refresh_documents(Schedule.objects.filter(**{field: instance}))
+
+
+def user_changed(sender, instance, **kwargs):
+    # drop the cached JWT user once the change is visible to other requests
+    user_id = instance.user_id if sender is TokenVersion else instance.pk
+    transaction.on_commit(lambda: forget_user(user_id))
+
+
+for _model in (get_user_model(), TokenVersion):
+    post_save.connect(user_changed, sender=_model, dispatch_uid=f'user_changed_{_model.__name__}')
+    post_delete.connect(user_changed, sender=_model, dispatch_uid=f'user_deleted_{_model.__name__}')
+
+
+def bulk_saved(model, objs):
+    # bulk_create/bulk_update send no signals; do what the receivers above would have done
+    objs = list(objs)
+    journal.record_upserts(model, [obj.pk for obj in objs])
+    response_cache.changed(model, objs)
+    if model is Schedule:
+        get_search_backend().index([(obj.pk, obj.search_document) for obj in objs])
+        transaction.on_commit(lambda: [schedule_index.upsert(obj) for obj in objs])
+
+
+def bulk_deleted(model, ids):
+    # same as bulk_saved, for deletes that bypass the collector
+    ids = list(ids)
+    journal.record_deletes(model, ids)
+    response_cache.changed(model)
+    if model is Schedule:
+        get_search_backend().remove(ids)
+        transaction.on_commit(lambda: [schedule_index.discard(pk) for pk in ids])
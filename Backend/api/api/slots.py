@@ -0,0 +1,199 @@
+"""
+Open-slot computation for the schedules board.
+
+Intern availabilities, patient availabilities and bookings are loaded with one
+date-bounded range query per table and combined with sorted interval sweeps,
+so the cost grows with the size of the requested window instead of the whole
+history.
+"""
+from datetime import datetime, time, timedelta
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Availability, AvailabilityRule, PatientAvailability, PatientAvailabilityRule, Schedule
+from .recurrence import expand_rules
+
+DEFAULT_SLOT_MINUTES = 60
+MAX_WINDOW_DAYS = 92
+
+
+def parse_bound(value, end=False):
+    """
+    Parse a ``start``/``end`` query param into an aware datetime.
+
+    Plain dates are expanded to whole days: a start date maps to its midnight
+    and an end date to the following midnight, so ``end`` stays inclusive for
+    callers while the resulting range is half-open.
+    """
+    if not value:
+        return None
+    d = parse_date(value)
+    if d is not None:
+        if end:
+            d += timedelta(days=1)
+        dt = datetime.combine(d, time.min)
+    else:
+        dt = parse_datetime(value)
+        if dt is None:
+            raise ValueError(f'invalid date: {value}')
+    if timezone.is_naive(dt):
+        dt = timezone.make_aware(dt)
+    return dt
+
+
+def merge_intervals(intervals):
+    # intervals must be sorted by start; overlapping and touching ranges are joined
+    merged = []
+    for start, end in intervals:
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+    return [(s, e) for s, e in merged]
+
+
+def subtract_intervals(base, busy):
+    # both lists sorted and merged; single forward sweep over `busy`
+    result = []
+    i = 0
+    for start, end in base:
+        while i < len(busy) and busy[i][1] <= start:
+            i += 1
+        cur = start
+        j = i
+        while j < len(busy) and busy[j][0] < end:
+            if busy[j][0] > cur:
+                result.append((cur, busy[j][0]))
+            cur = max(cur, busy[j][1])
+            j += 1
+        if cur < end:
+            result.append((cur, end))
+    return result
+
+
+def intersect_intervals(a, b):
+    # both lists sorted and merged
+    result = []
+    i = j = 0
+    while i < len(a) and j < len(b):
+        start = max(a[i][0], b[j][0])
+        end = min(a[i][1], b[j][1])
+        if start < end:
+            result.append((start, end))
+        if a[i][1] < b[j][1]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def split_into_slots(intervals, slot_minutes=DEFAULT_SLOT_MINUTES):
+    """Cut free intervals into fixed-length slots aligned to the slot length (local time)."""
+    length = timedelta(minutes=slot_minutes)
+    slots = []
+    for start, end in intervals:
+        local = timezone.localtime(start)
+        midnight = local.replace(hour=0, minute=0, second=0, microsecond=0)
+        offset = (local - midnight) % length
+        cur = local if not offset else local + (length - offset)
+        while cur + length <= end:
+            slots.append((cur, cur + length))
+            cur += length
+    return slots
+
+
+def _group_by(rows):
+    # rows are (key, start, end) tuples ordered by key then start
+    groups = {}
+    for key, start, end in rows:
+        groups.setdefault(key, []).append((start, end))
+    return groups
+
+
+def _clip(intervals, start, end):
+    return [(max(s, start), min(e, end)) for s, e in intervals if s < end and e > start]
+
+
+def patient_free_windows(patient_ids, start, end):
+    """
+    Return {patient_id: free intervals} between ``start`` and ``end``: the
+    patient's availability (rows and rule occurrences) minus their bookings.
+    Patients without any free time are left out.
+    """
+    windows = _group_by(
+        PatientAvailability.objects.filter(patient_id__in=patient_ids, start_date__lt=end, end_date__gt=start)
+        .order_by('patient_id', 'start_date').values_list('patient_id', 'start_date', 'end_date')
+    )
+    rules = PatientAvailabilityRule.objects.filter(patient_id__in=patient_ids)
+    for patient_id, occ_start, occ_end, _ in expand_rules(rules, 'patient', start, end):
+        windows.setdefault(patient_id, []).append((occ_start, occ_end))
+    if not windows:
+        return {}
+    booked = _group_by(
+        Schedule.objects.filter(patient_id__in=list(windows), start_time__lt=end, end_time__gt=start)
+        .order_by('patient_id', 'start_time').values_list('patient_id', 'start_time', 'end_time')
+    )
+    free = {}
+    for patient_id, intervals in windows.items():
+        intervals = subtract_intervals(
+            merge_intervals(_clip(sorted(intervals), start, end)),
+            merge_intervals(booked.get(patient_id, [])),
+        )
+        if intervals:
+            free[patient_id] = intervals
+    return free
+
+
+def find_open_slots(start, end, intern=None, patient=None, slot_minutes=DEFAULT_SLOT_MINUTES):
+    """
+    Return free intern slots between ``start`` and ``end``.
+
+    When ``patient`` is given only slots inside that patient's availability
+    and outside the patient's own bookings are returned.
+    """
+    avail = Availability.objects.filter(
+        start_date__lt=end, end_date__gt=start, intern__is_active=True
+    )
+    busy = Schedule.objects.filter(start_time__lt=end, end_time__gt=start)
+    if intern is not None:
+        avail = avail.filter(intern_id=intern)
+        busy = busy.filter(intern_id=intern)
+    intern_avail = _group_by(
+        avail.order_by('intern_id', 'start_date').values_list('intern_id', 'start_date', 'end_date')
+    )
+    # recurring rules only become intervals for the requested window
+    rules = AvailabilityRule.objects.filter(intern__is_active=True)
+    if intern is not None:
+        rules = rules.filter(intern_id=intern)
+    for intern_id, occ_start, occ_end, _ in expand_rules(rules, 'intern', start, end):
+        intern_avail.setdefault(intern_id, []).append((occ_start, occ_end))
+    for intervals in intern_avail.values():
+        intervals.sort()
+    if not intern_avail:
+        return []
+    intern_busy = _group_by(
+        busy.filter(intern_id__in=list(intern_avail))
+        .order_by('intern_id', 'start_time')
+        .values_list('intern_id', 'start_time', 'end_time')
+    )
+
+    patient_windows = None
+    if patient is not None:
+        patient_windows = patient_free_windows([patient], start, end).get(patient)
+        if not patient_windows:
+            return []
+
+    slots = []
+    for intern_id, intervals in intern_avail.items():
+        free = subtract_intervals(
+            merge_intervals(_clip(intervals, start, end)),
+            merge_intervals(intern_busy.get(intern_id, [])),
+        )
+        if patient_windows is not None:
+            free = intersect_intervals(free, patient_windows)
+        for slot_start, slot_end in split_into_slots(free, slot_minutes):
+            slots.append({'intern': intern_id, 'start': slot_start, 'end': slot_end})
+    slots.sort(key=lambda s: (s['start'], s['intern']))
+    return slots
@@ -0,0 +1,68 @@
+"""
+Sparse fieldsets and embedded names for read requests.
+
+``?fields=id,start_time`` limits every row to the listed fields and
+``?expand=intern,patient`` replaces those foreign key ids with a compact
+``{id, first_name, last_name}`` object, so the board doesn't need the whole
+intern and patient tables to print names. Expanded relations are fetched with
+the row through ``select_related`` (or a ``.values()`` join on the fast list
+path), never one lookup per row. Writes ignore both parameters.
+"""
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+class PersonNameSerializer(serializers.Serializer):
+    id = serializers.IntegerField(read_only=True)
+    first_name = serializers.CharField(read_only=True)
+    last_name = serializers.CharField(read_only=True)
+
+
+def _param_list(request, name):
+    value = request.query_params.get(name)
+    if not value:
+        return []
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def requested_expansions(request, serializer_class):
+    """The ``?expand=`` names ``serializer_class`` supports, for read requests only."""
+    if request is None or request.method not in SAFE_METHODS:
+        return []
+    allowed = getattr(serializer_class, 'expandable_fields', ())
+    names = _param_list(request, 'expand')
+    unknown = [name for name in names if name not in allowed]
+    if unknown:
+        raise serializers.ValidationError({'expand': f'cannot expand: {", ".join(unknown)}'})
+    return names
+
+
+class SparseFieldsMixin:
+    """Serializer mixin applying ``?fields=`` and ``?expand=`` from the request in the context."""
+    expandable_fields = ()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        request = self.context.get('request')
+        if request is None or request.method not in SAFE_METHODS:
+            return fields
+        for name in requested_expansions(request, type(self)):
+            fields[name] = PersonNameSerializer(read_only=True)
+        wanted = _param_list(request, 'fields')
+        if wanted:
+            unknown = [name for name in wanted if name not in fields]
+            if unknown:
+                raise serializers.ValidationError({'fields': f'unknown field(s): {", ".join(unknown)}'})
+            fields = {name: field for name, field in fields.items() if name in wanted}
+        return fields
+
+
+class ExpandMixin:
+    """Viewset mixin: join the relations named in ``?expand=`` into the queryset."""
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        expand = requested_expansions(self.request, self.get_serializer_class())
+        if expand:
+            qs = qs.select_related(*expand)
+        return qs
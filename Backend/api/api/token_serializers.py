@@ -1,6 +1,10 @@
-from django.contrib.auth import get_user_model
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .authentication import TOKEN_VERSION_CLAIM, current_version
 
 
 class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
@@ -9,6 +13,13 @@ class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
     Accepts either 'email' or 'username' in the request body.
     """
 
+    @classmethod
+    def get_token(cls, user):
+        token = super().get_token(user)
+        # checked by CachedJWTAuthentication; revoking tokens bumps the user's version
+        token[TOKEN_VERSION_CLAIM] = current_version(user.pk)
+        return token
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         # allow 'email' to be submitted and don't require 'username' when email is provided
@@ -19,18 +30,20 @@ class EmailTokenObtainPairSerializer(TokenObtainPairSerializer):
             self.fields['username'].required = False
 
     def validate(self, attrs):
-        # attrs may contain 'email' or 'username' and 'password'. If email provided, map it
-        email = attrs.get('email')
-        username = attrs.get('username')
-
-        User = get_user_model()
-        if email and ("@" in str(email)):
-            try:
-                user = User.objects.get(email=email)
-                # ensure the underlying authentication uses the actual username
-                attrs['username'] = user.get_username()
-            except User.DoesNotExist:
-                # leave attrs as-is; authentication will fail downstream with proper message
-                pass
+        # attrs may contain 'email' or 'username' and 'password'. The email goes through as the
+        # username: EmailOrUsernameBackend looks up either in one query and returns the user
+        if not attrs.get('username'):
+            attrs['username'] = attrs.get('email') or ''
+        return super().validate(attrs)
 
+
+class VersionedTokenRefreshSerializer(TokenRefreshSerializer):
+    """Refuse refresh tokens issued before the user's tokens were last revoked."""
+
+    def validate(self, attrs):
+        refresh = RefreshToken(attrs['refresh'])
+        user_id = refresh.payload.get(api_settings.USER_ID_CLAIM)
+        if refresh.payload.get(TOKEN_VERSION_CLAIM, 0) != current_version(user_id):
+            raise InvalidToken('Token has been revoked')
+        # access tokens copy the refresh token's claims, 'ver' included
         return super().validate(attrs)
@@ -1,7 +1,12 @@
-from rest_framework_simplejwt.views import TokenObtainPairView
-from .token_serializers import EmailTokenObtainPairSerializer
+from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from .token_serializers import EmailTokenObtainPairSerializer, VersionedTokenRefreshSerializer
 
 
 class EmailTokenObtainPairView(TokenObtainPairView):
     """Token view that uses EmailTokenObtainPairSerializer."""
     serializer_class = EmailTokenObtainPairSerializer
+
+
+class VersionedTokenRefreshView(TokenRefreshView):
+    """Refresh view that rejects revoked refresh tokens."""
+    serializer_class = VersionedTokenRefreshSerializer
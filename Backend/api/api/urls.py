@@ -16,14 +16,19 @@ Including another URLconf
 """
 from django.contrib import admin
 from django.urls import path
-from rest_framework_simplejwt.views import (
-    TokenRefreshView,
-)
-from .token_views import EmailTokenObtainPairView
+from .feeds import calendar_feed
+from .live import live_changes
+from .metrics import metrics_view
+from .response_cache import cache_stats_view
+from .token_views import EmailTokenObtainPairView, VersionedTokenRefreshView
 from .users_views import UserListView
 from rest_framework import routers
 from django.urls import include
-from .viewsets import UserViewSet, TurmaViewSet, PatientViewSet, EstagiarioViewSet, AvailabilityViewSet, ScheduleViewSet, PatientAvailabilityViewSet
+from .viewsets import (
+    UserViewSet, TurmaViewSet, PatientViewSet, EstagiarioViewSet, AvailabilityViewSet, SlotViewSet, ScheduleViewSet,
+    PatientAvailabilityViewSet, SyncViewSet, AvailabilityRuleViewSet, PatientAvailabilityRuleViewSet,
+    CascadeJobViewSet, CalendarViewSet, RoomViewSet, FeedTokenViewSet,
+)
 
 router = routers.DefaultRouter()
 router.register(r'users', UserViewSet, basename='user')
@@ -31,14 +36,30 @@ router.register(r'turmas', TurmaViewSet, basename='turma')
 router.register(r'patients', PatientViewSet, basename='patient')
 router.register(r'estagiarios', EstagiarioViewSet, basename='estagiario')
 router.register(r'availabilities', AvailabilityViewSet, basename='availability')
+router.register(r'slots', SlotViewSet, basename='slot')
+router.register(r'calendar', CalendarViewSet, basename='calendar')
 router.register(r'schedules', ScheduleViewSet, basename='schedule')
+router.register(r'rooms', RoomViewSet, basename='room')
 router.register(r'patientavailabilities', PatientAvailabilityViewSet, basename='patientavailability')
+router.register(r'availabilityrules', AvailabilityRuleViewSet, basename='availabilityrule')
+router.register(r'patientavailabilityrules', PatientAvailabilityRuleViewSet, basename='patientavailabilityrule')
+router.register(r'cascadejobs', CascadeJobViewSet, basename='cascadejob')
+router.register(r'feedtokens', FeedTokenViewSet, basename='feedtoken')
+router.register(r'sync', SyncViewSet, basename='sync')
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     # JWT auth endpoints (used by frontend to obtain access/refresh tokens)
     path('api/token/', EmailTokenObtainPairView.as_view(), name='token_obtain_pair'),
-    path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('api/token/refresh/', VersionedTokenRefreshView.as_view(), name='token_refresh'),
+    # Server-Sent Events stream of schedule/availability changes (needs an ASGI server)
+    path('api/live/', live_changes, name='live_changes'),
+    # iCalendar subscriptions, authorized by the secret feed token in the URL
+    path('api/feeds/<str:token>.ics', calendar_feed, name='calendar_feed'),
+    # Prometheus scrape endpoint, only active with API_METRICS=1
+    path('api/_metrics', metrics_view, name='metrics'),
+    # response cache hit ratios per route (api/response_cache.py)
+    path('api/_cache', cache_stats_view, name='cache_stats'),
 ]
 
 # include router URLs under /api/
@@ -1,12 +1,42 @@
+from datetime import timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from rest_framework import viewsets, permissions
-from django.db.models import Q
+from rest_framework import mixins, viewsets, permissions
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.response import Response
 
-from .serializers import UserSerializer, TurmaSerializer, PatientSerializer, EstagiarioSerializer, AvailabilitySerializer, ScheduleSerializer, PatientAvailabilitySerializer
-from .models import Turma, Patient, Estagiario, Availability, Schedule, PatientAvailability
+from .serializers import (
+    UserSerializer, TurmaSerializer, PatientSerializer, EstagiarioSerializer, AvailabilitySerializer,
+    ScheduleSerializer, PatientAvailabilitySerializer, AvailabilityRuleSerializer, PatientAvailabilityRuleSerializer,
+    CascadeJobSerializer, AutoScheduleSerializer, RoomSerializer, FeedTokenSerializer,
+)
+from .models import (
+    Turma, Patient, Estagiario, Availability, Schedule, PatientAvailability, AvailabilityRule,
+    PatientAvailabilityRule, ChangeLogEntry, CascadeJob, Room, FeedToken,
+)
+from . import journal
+from .agenda import calendar
+from .authentication import revoke_tokens
+from .autoschedule import solve
+from .booking import booking_transaction
+from .bulk import BulkModelMixin
+from .cascade import BACKGROUND_THRESHOLD, count_targets, deactivate, start_job
+from .coalesce import CoalescingMixin
+from .conditional import ConditionalGetMixin
+from .fastlist import FastListMixin
+from .response_cache import CachedResponseMixin
+from .rooms import free_intervals
+from .sparse import ExpandMixin
+from .interval_index import schedule_index
+from .recurrence import expand_rules
+from .pagination import OptionalPageNumberPagination, StartDateCursorPagination, StartTimeCursorPagination
+from .search import get_search_backend
+from .slots import DEFAULT_SLOT_MINUTES, MAX_WINDOW_DAYS, find_open_slots, parse_bound
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 
 
 class IsAdminOrReadWrite(permissions.BasePermission):
@@ -15,124 +45,409 @@ class IsAdminOrReadWrite(permissions.BasePermission):
         return request.user and request.user.is_authenticated
 
 
+class DateWindowMixin:
+    # list endpoints over time-based rows default to a window around now so payloads
+    # don't grow with history; pass start/end or window=all to override
+    window_start_field = 'start_date'
+    window_end_field = 'end_date'
+
+    def parse_window(self):
+        params = self.request.query_params
+        try:
+            start = parse_bound(params.get('start'))
+            end = parse_bound(params.get('end'), end=True)
+        except ValueError as e:
+            raise ValidationError({'detail': str(e)})
+        if start is None and end is None and self.action == 'list' and params.get('window') != 'all':
+            now = timezone.now()
+            span = timedelta(weeks=settings.LIST_WINDOW_WEEKS)
+            return now - span, now + span, True
+        return start, end, False
+
+    def filter_window(self, qs):
+        # rows overlapping the window, so the ones crossing its edges (multi-day or
+        # coalesced availabilities) still show; the start bound uses the start index
+        start, end, _ = self.parse_window()
+        if start is not None:
+            qs = qs.filter(**{f'{self.window_end_field}__gt': start})
+        if end is not None:
+            qs = qs.filter(**{f'{self.window_start_field}__lt': end})
+        return qs
+
+
 class UserViewSet(viewsets.ModelViewSet):
     queryset = get_user_model().objects.all().order_by('id')
     serializer_class = UserSerializer
     permission_classes = [IsAdminOrReadWrite]
+    pagination_class = OptionalPageNumberPagination
+
+    @action(detail=True, methods=['post'], url_path='revoke-tokens')
+    def revoke_tokens(self, request, pk=None):
+        # log a user out everywhere: every access and refresh token issued so far stops working
+        user = self.get_object()
+        if user.pk != request.user.pk and not request.user.is_staff:
+            raise PermissionDenied('Only staff can revoke another user\'s tokens.')
+        return Response({'token_version': revoke_tokens(user)})
 
 
-class TurmaViewSet(viewsets.ModelViewSet):
+class TurmaViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
     queryset = Turma.objects.all().order_by('id')
     serializer_class = TurmaSerializer
     permission_classes = [IsAdminOrReadWrite]
+    pagination_class = OptionalPageNumberPagination
 
 
-class PatientViewSet(viewsets.ModelViewSet):
-    # list only active patients by default
-    queryset = Patient.objects.filter(is_active=True).order_by('id')
-    serializer_class = PatientSerializer
-    permission_classes = [IsAdminOrReadWrite]
-
+class SoftDeleteMixin:
     def destroy(self, request, pk=None):
-        # soft-delete: mark patient inactive and remove future patient availabilities and schedules
+        # soft-delete: mark the patient/intern inactive and remove their future availabilities and schedules
+        model = self.queryset.model
         try:
-            pt = Patient.objects.get(pk=pk)
-        except Patient.DoesNotExist:
+            person = model.objects.get(pk=pk)
+        except model.DoesNotExist:
             return Response(status=404)
-        pt.is_active = False
-        pt.save()
-        now = timezone.now()
-        PatientAvailability.objects.filter(patient=pt, start_date__gt=now).delete()
-        Schedule.objects.filter(patient=pt, start_time__gt=now).delete()
+        cutoff = timezone.now()
+        total = count_targets(person, cutoff)
+        # large cascades (or ?background=1) are deleted in chunks by a CascadeJob
+        if request.query_params.get('background') in ('1', 'true') or total > BACKGROUND_THRESHOLD:
+            job = start_job(person, cutoff, total)
+            return Response(CascadeJobSerializer(job).data, status=202)
+        deactivate(person, cutoff)
         return Response(status=204)
 
 
-class EstagiarioViewSet(viewsets.ModelViewSet):
+class PatientViewSet(ConditionalGetMixin, CachedResponseMixin, FastListMixin, SoftDeleteMixin,
+                     viewsets.ModelViewSet):
+    # list only active patients by default
+    queryset = Patient.objects.filter(is_active=True).order_by('id')
+    serializer_class = PatientSerializer
+    permission_classes = [IsAdminOrReadWrite]
+    pagination_class = OptionalPageNumberPagination
+
+
+class EstagiarioViewSet(ConditionalGetMixin, CachedResponseMixin, FastListMixin, SoftDeleteMixin,
+                        viewsets.ModelViewSet):
     # only list active interns by default
     queryset = Estagiario.objects.filter(is_active=True).order_by('id')
     serializer_class = EstagiarioSerializer
     permission_classes = [IsAdminOrReadWrite]
-
-    def destroy(self, request, pk=None):
-        # Instead of hard-deleting, mark intern as inactive and remove future availabilities and schedules
-        try:
-            est = Estagiario.objects.get(pk=pk)
-        except Estagiario.DoesNotExist:
-            return Response(status=404)
-        # mark inactive
-        est.is_active = False
-        est.save()
-        # remove future availabilities and schedules for this intern
-        now = timezone.now()
-        Availability.objects.filter(intern=est, start_date__gt=now).delete()
-        Schedule.objects.filter(intern=est, start_time__gt=now).delete()
-        return Response(status=204)
+    pagination_class = OptionalPageNumberPagination
 
 
-class AvailabilityViewSet(viewsets.ModelViewSet):
+class AvailabilityViewSet(ConditionalGetMixin, CachedResponseMixin, FastListMixin, ExpandMixin, CoalescingMixin,
+                          BulkModelMixin, DateWindowMixin, viewsets.ModelViewSet):
     queryset = Availability.objects.all().order_by('id')
     serializer_class = AvailabilitySerializer
     permission_classes = [IsAdminOrReadWrite]
+    pagination_class = StartDateCursorPagination
+    cache_depends_on = ('estagiario',)
 
     def get_queryset(self):
         qs = super().get_queryset()
         intern = self.request.query_params.get('intern')
         if intern is not None:
             qs = qs.filter(intern_id=intern)
+        return self.filter_window(qs)
+
+
+def parse_required_window(params):
+    try:
+        start = parse_bound(params.get('start'))
+        end = parse_bound(params.get('end'), end=True)
+    except ValueError as e:
+        raise ValidationError({'detail': str(e)})
+    if start is None or end is None:
+        raise ValidationError({'detail': 'start and end are required'})
+    if end <= start or end - start > timedelta(days=MAX_WINDOW_DAYS):
+        raise ValidationError({'detail': f'date range must be positive and at most {MAX_WINDOW_DAYS} days'})
+    return start, end
+
+
+class RecurrenceRuleViewSetMixin:
+    # subclasses set owner_field ('intern' or 'patient')
+    owner_field = None
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        owner = self.request.query_params.get(self.owner_field)
+        if owner is not None:
+            qs = qs.filter(**{f'{self.owner_field}_id': owner})
         return qs
 
+    @action(detail=False, methods=['get'])
+    def occurrences(self, request):
+        # concrete intervals of the rules, expanded only inside the requested window
+        start, end = parse_required_window(request.query_params)
+        rows = [
+            {'rule': rule_id, self.owner_field: owner, 'start_date': occ_start, 'end_date': occ_end}
+            for owner, occ_start, occ_end, rule_id in expand_rules(self.get_queryset(), self.owner_field, start, end)
+        ]
+        rows.sort(key=lambda r: (r['start_date'], r['rule']))
+        return Response(rows)
+
+
+class AvailabilityRuleViewSet(CachedResponseMixin, RecurrenceRuleViewSetMixin, viewsets.ModelViewSet):
+    queryset = AvailabilityRule.objects.all().order_by('id')
+    serializer_class = AvailabilityRuleSerializer
+    permission_classes = [IsAdminOrReadWrite]
+    pagination_class = OptionalPageNumberPagination
+    owner_field = 'intern'
+
+
+class SlotViewSet(viewsets.ViewSet):
+    # free intern slots for a date range, optionally restricted to a patient's availability
+    permission_classes = [IsAdminOrReadWrite]
+
+    def list(self, request):
+        params = request.query_params
+        start, end = parse_required_window(params)
+        try:
+            slot_minutes = int(params.get('slot_minutes') or DEFAULT_SLOT_MINUTES)
+            intern = int(params['intern']) if params.get('intern') else None
+            patient = int(params['patient']) if params.get('patient') else None
+        except ValueError as e:
+            raise ValidationError({'detail': str(e)})
+        if not 5 <= slot_minutes <= 24 * 60:
+            raise ValidationError({'slot_minutes': 'must be between 5 and 1440'})
+        slots = find_open_slots(start, end, intern=intern, patient=patient, slot_minutes=slot_minutes)
+        return Response(slots)
+
+
+class CalendarViewSet(viewsets.ViewSet):
+    # bookings, free slots and patient windows grouped per local day (see agenda.py)
+    permission_classes = [IsAdminOrReadWrite]
+
+    def list(self, request):
+        params = request.query_params
+        try:
+            tz = ZoneInfo(params.get('tz') or settings.TIME_ZONE)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValidationError({'tz': f"unknown timezone: {params.get('tz')}"})
+        try:
+            first_day = parse_date(params.get('start') or '')
+            last_day = parse_date(params.get('end') or '')
+            slot_minutes = int(params.get('slot_minutes') or DEFAULT_SLOT_MINUTES)
+            intern = int(params['intern']) if params.get('intern') else None
+            patient = int(params['patient']) if params.get('patient') else None
+        except ValueError as e:
+            raise ValidationError({'detail': str(e)})
+        if first_day is None or last_day is None:
+            raise ValidationError({'detail': 'start and end dates (YYYY-MM-DD) are required'})
+        if last_day < first_day or (last_day - first_day).days >= MAX_WINDOW_DAYS:
+            raise ValidationError({'detail': f'date range must be positive and at most {MAX_WINDOW_DAYS} days'})
+        if not 5 <= slot_minutes <= 24 * 60:
+            raise ValidationError({'slot_minutes': 'must be between 5 and 1440'})
+        days = calendar(first_day, last_day, tz, intern=intern, patient=patient, slot_minutes=slot_minutes)
+        return Response({'timezone': tz.key, 'days': days})
+
+
+class RoomViewSet(CachedResponseMixin, viewsets.ModelViewSet):
+    queryset = Room.objects.all().order_by('id')
+    serializer_class = RoomSerializer
+    permission_classes = [IsAdminOrReadWrite]
+    pagination_class = OptionalPageNumberPagination
 
+    def destroy(self, request, *args, **kwargs):
+        if self.get_object().schedules.exists():
+            raise ValidationError({'detail': 'the room has bookings; set is_active to false instead'})
+        return super().destroy(request, *args, **kwargs)
 
-class ScheduleViewSet(viewsets.ModelViewSet):
+    @action(detail=False, methods=['get'])
+    def free(self, request):
+        # free time of every active room in the window: opening hours minus one range query of bookings
+        params = request.query_params
+        start, end = parse_required_window(params)
+        try:
+            min_minutes = int(params.get('min_minutes') or 1)
+            capacity = int(params.get('capacity') or 1)
+        except ValueError as e:
+            raise ValidationError({'detail': str(e)})
+        rooms = list(self.get_queryset().filter(is_active=True, capacity__gte=capacity))
+        free = free_intervals(rooms, start, end)
+        shortest = timedelta(minutes=min_minutes)
+        result = []
+        for room in rooms:
+            intervals = [{'start': s, 'end': e} for s, e in free[room.pk] if e - s >= shortest]
+            if intervals:
+                result.append({'room': room.pk, 'name': room.name, 'capacity': room.capacity, 'free': intervals})
+        return Response(result)
+
+
+class ScheduleViewSet(ConditionalGetMixin, CachedResponseMixin, FastListMixin, ExpandMixin, BulkModelMixin,
+                      DateWindowMixin, viewsets.ModelViewSet):
     queryset = Schedule.objects.all().order_by('id')
     serializer_class = ScheduleSerializer
     permission_classes = [IsAdminOrReadWrite]
+    pagination_class = StartTimeCursorPagination
+    # embedded names and the ?q= search read the people
+    cache_depends_on = ('estagiario', 'patient')
+    window_start_field = 'start_time'
+    window_end_field = 'end_time'
+    bulk_time_fields = ('start_time', 'end_time')
+    bulk_overlap_fields = ('intern', 'patient', 'room')
+    bulk_select_related = ('intern', 'patient')
 
-    def get_queryset(self):
-        qs = super().get_queryset()
-        patient = self.request.query_params.get('patient')
-        intern = self.request.query_params.get('intern')
-        if patient is not None:
-            qs = qs.filter(patient_id=patient)
-        if intern is not None:
-            qs = qs.filter(intern_id=intern)
-        return qs
+    # the overlap check and the write share one serialized transaction (api/booking.py)
+    def write_transaction(self):
+        return booking_transaction()
+
+    def create(self, request, *args, **kwargs):
+        with booking_transaction():
+            return super().create(request, *args, **kwargs)
+
+    def update(self, request, *args, **kwargs):
+        with booking_transaction():
+            return super().update(request, *args, **kwargs)
 
     # allow filtering schedules by date range and text query
     def get_queryset(self):
         qs = super().get_queryset()
         patient = self.request.query_params.get('patient')
         intern = self.request.query_params.get('intern')
-        start = self.request.query_params.get('start')
-        end = self.request.query_params.get('end')
         q = self.request.query_params.get('q')
         if patient is not None:
             qs = qs.filter(patient_id=patient)
         if intern is not None:
             qs = qs.filter(intern_id=intern)
-        if start:
-            qs = qs.filter(start_time__date__gte=start)
-        if end:
-            qs = qs.filter(end_time__date__lte=end)
+        # start/end are whole days turned into half-open datetime ranges on the raw
+        # columns (no date cast), so the (resource, start_time) indexes apply
+        qs = self.filter_window(qs)
         if q:
-            qs = qs.filter(
-                Q(intern__first_name__icontains=q) |
-                Q(intern__last_name__icontains=q) |
-                Q(patient__first_name__icontains=q) |
-                Q(patient__last_name__icontains=q) |
-                Q(room_id__icontains=q)
-            )
+            # names go through the indexed search document, room numbers match exactly
+            qs = get_search_backend().filter(qs, q)
         return qs
 
+    @action(detail=False, methods=['get'])
+    def conflicts(self, request):
+        # every pair of bookings sharing an intern, patient or room that overlap in the range
+        try:
+            start = parse_bound(request.query_params.get('start'))
+            end = parse_bound(request.query_params.get('end'), end=True)
+        except ValueError as e:
+            raise ValidationError({'detail': str(e)})
+        if start is None or end is None or end <= start:
+            raise ValidationError({'detail': 'start and end are required'})
+        return Response(schedule_index.all_conflicts(start, end))
+
+    @action(detail=False, methods=['post'])
+    def auto(self, request):
+        # propose bookings for patients needing N sessions a week; with commit=true they are created
+        serializer = AutoScheduleSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        result = solve(
+            {row['patient'].pk: row['sessions_per_week'] for row in data['patients']},
+            parse_bound(data['start'].isoformat()),
+            parse_bound(data['end'].isoformat(), end=True),
+            interns=data.get('interns'),
+            rooms=data.get('rooms'),
+            slot_minutes=data['slot_minutes'],
+            max_per_day=data['max_per_day'],
+            time_limit=data['time_limit'],
+        )
+        if not data['commit']:
+            return Response(result)
+        # same path as POST bulk/, so overlaps booked in the meantime fail the whole batch
+        created = self.bulk_create_rows(result['schedules'])
+        result['schedules'] = ScheduleSerializer(created, many=True).data
+        return Response(result, status=201)
+
 
-class PatientAvailabilityViewSet(viewsets.ModelViewSet):
+class PatientAvailabilityViewSet(ConditionalGetMixin, CachedResponseMixin, FastListMixin, ExpandMixin,
+                                 CoalescingMixin, BulkModelMixin, DateWindowMixin, viewsets.ModelViewSet):
     queryset = PatientAvailability.objects.all().order_by('id')
     serializer_class = PatientAvailabilitySerializer
     permission_classes = [IsAdminOrReadWrite]
+    pagination_class = StartDateCursorPagination
+    cache_depends_on = ('patient',)
 
     def get_queryset(self):
         qs = super().get_queryset()
         patient = self.request.query_params.get('patient')
         if patient is not None:
             qs = qs.filter(patient_id=patient)
-        return qs
+        return self.filter_window(qs)
+
+
+class PatientAvailabilityRuleViewSet(CachedResponseMixin, RecurrenceRuleViewSetMixin, viewsets.ModelViewSet):
+    queryset = PatientAvailabilityRule.objects.all().order_by('id')
+    serializer_class = PatientAvailabilityRuleSerializer
+    permission_classes = [IsAdminOrReadWrite]
+    pagination_class = OptionalPageNumberPagination
+    owner_field = 'patient'
+
+
+class CascadeJobViewSet(viewsets.ReadOnlyModelViewSet):
+    # progress of background soft-delete cascades
+    queryset = CascadeJob.objects.all().order_by('-id')
+    serializer_class = CascadeJobSerializer
+    permission_classes = [IsAdminOrReadWrite]
+    pagination_class = OptionalPageNumberPagination
+
+
+class FeedTokenViewSet(mixins.CreateModelMixin, mixins.DestroyModelMixin, viewsets.ReadOnlyModelViewSet):
+    # iCalendar subscription URLs; users see their own, staff all of them. Delete one to revoke it
+    serializer_class = FeedTokenSerializer
+    permission_classes = [IsAdminOrReadWrite]
+    pagination_class = OptionalPageNumberPagination
+
+    def get_queryset(self):
+        queryset = FeedToken.objects.all().order_by('id')
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
+
+    def perform_create(self, serializer):
+        serializer.save(created_by=self.request.user)
+
+
+class SyncViewSet(viewsets.ViewSet):
+    # delta sync: upserts and tombstones recorded in the change journal after `since`
+    permission_classes = [IsAdminOrReadWrite]
+    max_entries = 5000
+    resources = {
+        'turma': ('turmas', Turma, TurmaSerializer),
+        'patient': ('patients', Patient, PatientSerializer),
+        'estagiario': ('estagiarios', Estagiario, EstagiarioSerializer),
+        'availability': ('availabilities', Availability, AvailabilitySerializer),
+        'patientavailability': ('patientavailabilities', PatientAvailability, PatientAvailabilitySerializer),
+        'schedule': ('schedules', Schedule, ScheduleSerializer),
+        'availabilityrule': ('availabilityrules', AvailabilityRule, AvailabilityRuleSerializer),
+        'patientavailabilityrule': ('patientavailabilityrules', PatientAvailabilityRule,
+                                    PatientAvailabilityRuleSerializer),
+        'room': ('rooms', Room, RoomSerializer),
+    }
+
+    def list(self, request):
+        try:
+            since = int(request.query_params.get('since') or 0)
+        except ValueError:
+            raise ValidationError({'since': 'must be an integer token'})
+        # entries past the settled head may still have uncommitted predecessors
+        head = journal.settled_version()
+        entries = list(
+            ChangeLogEntry.objects.filter(id__gt=since, id__lte=head).order_by('id')
+            .values_list('id', 'model', 'object_id', 'op')[:self.max_entries + 1]
+        )
+        has_more = len(entries) > self.max_entries
+        entries = entries[:self.max_entries]
+        # otherwise the token is the settled head (lower than `since` after a journal reset)
+        token = entries[-1][0] if has_more else head
+
+        # only the last operation per row matters
+        last_op = {}
+        for _, model, object_id, op in entries:
+            last_op[(model, object_id)] = op
+        changes = {}
+        for model, (name, model_cls, serializer_cls) in self.resources.items():
+            upsert_ids = [pk for (m, pk), op in last_op.items() if m == model and op == ChangeLogEntry.UPSERT]
+            deleted = [pk for (m, pk), op in last_op.items() if m == model and op == ChangeLogEntry.DELETE]
+            rows = list(model_cls.objects.filter(pk__in=upsert_ids).order_by('pk')) if upsert_ids else []
+            # a row upserted and then removed by a raw delete shows up as missing
+            found = {row.pk for row in rows}
+            deleted += [pk for pk in upsert_ids if pk not in found]
+            if rows or deleted:
+                changes[name] = {
+                    'upserts': serializer_cls(rows, many=True).data,
+                    'deleted': sorted(deleted),
+                }
+        return Response({'token': token, 'has_more': has_more, 'changes': changes})
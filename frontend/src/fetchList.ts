@@ -0,0 +1,41 @@
+// Collect every page of a list endpoint. Schedules and availabilities are
+// cursor-paginated ({ next, previous, results }); other lists are plain arrays.
+// Callers bound the query (the visible range below, or the server's default
+// window), so this walks the pages of what is on screen, not of the history.
+export async function fetchList(url: string, init?: RequestInit): Promise<any[] | null> {
+    const rows: any[] = [];
+    let next: string | null = url;
+    while (next) {
+        const resp: Response = await fetch(next, init);
+        if (!resp.ok) { console.error(await resp.text()); return null; }
+        const data = await resp.json();
+        if (Array.isArray(data)) return data;
+        rows.push(...(data.results || []));
+        next = data.next;
+    }
+    return rows;
+}
+
+const isoDay = (d: Date) => `${d.getFullYear()}-${String(d.getMonth()+1).padStart(2,'0')}-${String(d.getDate()).padStart(2,'0')}`;
+
+// Days shown by a day/week/month view as start/end query params (dates, end
+// inclusive). Weeks start on Sunday like the calendars; one extra day on each
+// side covers the difference between the browser's and the server's time zone.
+export function visibleRange(viewMode: 'day'|'week'|'month', date: Date): { start: string; end: string } {
+    const first = new Date(date.getFullYear(), date.getMonth(), date.getDate());
+    const last = new Date(first);
+    if (viewMode === 'week') {
+        first.setDate(first.getDate() - first.getDay());
+        last.setTime(first.getTime());
+        last.setDate(first.getDate() + 6);
+    } else if (viewMode === 'month') {
+        first.setDate(1);
+        last.setMonth(first.getMonth() + 1, 0);
+    }
+    first.setDate(first.getDate() - 1);
+    last.setDate(last.getDate() + 1);
+    return { start: isoDay(first), end: isoDay(last) };
+}
+
+export const rangeParams = (range: { start: string; end: string }) =>
+    `start=${encodeURIComponent(range.start)}&end=${encodeURIComponent(range.end)}`;
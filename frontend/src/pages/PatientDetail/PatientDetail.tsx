@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { useParams } from 'react-router-dom';
 import './PatientDetail.css';
+import { fetchList, rangeParams, visibleRange } from '../../fetchList';
 
 export default function PatientDetail(){
     const API_BASE = (import.meta && import.meta.env && (import.meta.env.VITE_API_URL as string)) || 'http://localhost:8000';
@@ -20,6 +21,15 @@ export default function PatientDetail(){
     const [viewMode, setViewMode] = useState<'day'|'week'|'month'>('week');
     const [selectedDate, setSelectedDate] = useState<Date>(() => new Date());
 
+    // only the days on screen are fetched: the day/week calendar, and for this patient's
+    // bookings also the month calendar of the Agendamentos tab
+    const shownRange = () => visibleRange(viewMode, selectedDate);
+    const scheduleRange = () => {
+        const shown = shownRange();
+        const month = visibleRange('month', monthStart);
+        return { start: shown.start < month.start ? shown.start : month.start, end: shown.end > month.end ? shown.end : month.end };
+    };
+
     const fetchPatient = async () => {
         try{
             const token = localStorage.getItem('access_token');
@@ -31,24 +41,24 @@ export default function PatientDetail(){
     const fetchSchedules = async () => {
         try{
             const token = localStorage.getItem('access_token');
-            const resp = await fetch(`${API_BASE}/api/schedules/?patient=${id}`, { headers: { Authorization: `Bearer ${token}` } });
-            if(resp.ok) setSchedules(await resp.json());
+            const rows = await fetchList(`${API_BASE}/api/schedules/?patient=${id}&${rangeParams(scheduleRange())}`, { headers: { Authorization: `Bearer ${token}` } });
+            if (rows) setSchedules(rows);
         }catch(err){ console.error(err); }
     };
 
     const fetchAllSchedules = async () => {
         try{
             const token = localStorage.getItem('access_token');
-            const resp = await fetch(`${API_BASE}/api/schedules/`, { headers: { Authorization: `Bearer ${token}` } });
-            if(resp.ok) setAllSchedules(await resp.json());
+            const rows = await fetchList(`${API_BASE}/api/schedules/?${rangeParams(shownRange())}`, { headers: { Authorization: `Bearer ${token}` } });
+            if (rows) setAllSchedules(rows);
         }catch(err){ console.error(err); }
     };
 
     const fetchPatientAvailabilities = async () => {
         try{
             const token = localStorage.getItem('access_token');
-            const resp = await fetch(`${API_BASE}/api/patientavailabilities/?patient=${id}`, { headers: { Authorization: `Bearer ${token}` } });
-            if(resp.ok) setPatientAvailabilities(await resp.json());
+            const rows = await fetchList(`${API_BASE}/api/patientavailabilities/?patient=${id}&${rangeParams(shownRange())}`, { headers: { Authorization: `Bearer ${token}` } });
+            if (rows) setPatientAvailabilities(rows);
         }catch(err){ console.error(err); }
     };
 
@@ -63,12 +73,15 @@ export default function PatientDetail(){
     const fetchInternAvailabilities = async () => {
         try{
             const token = localStorage.getItem('access_token');
-            const resp = await fetch(`${API_BASE}/api/availabilities/`, { headers: { Authorization: `Bearer ${token}` } });
-            if(resp.ok) setInternAvailabilities(await resp.json());
+            const rows = await fetchList(`${API_BASE}/api/availabilities/?${rangeParams(shownRange())}`, { headers: { Authorization: `Bearer ${token}` } });
+            if (rows) setInternAvailabilities(rows);
         }catch(err){ console.error(err); }
     };
 
-    useEffect(()=>{ fetchPatient(); fetchSchedules(); fetchAllSchedules(); fetchInterns(); fetchPatientAvailabilities(); fetchInternAvailabilities(); }, [id]);
+    useEffect(()=>{ fetchPatient(); fetchInterns(); }, [id]);
+    // refetched when the calendars move
+    useEffect(()=>{ fetchAllSchedules(); fetchPatientAvailabilities(); fetchInternAvailabilities(); }, [id, viewMode, selectedDate]);
+    useEffect(()=>{ fetchSchedules(); }, [id, viewMode, selectedDate, monthStart]);
 
     const handleChange = (e: React.ChangeEvent<HTMLInputElement | HTMLSelectElement>) => setForm({ ...form, [e.target.name]: e.target.value });
 
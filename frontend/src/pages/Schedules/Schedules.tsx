@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import Select from 'react-select';
 import './Schedules.css';
+import { fetchList, rangeParams, visibleRange } from '../../fetchList';
 
 export default function Schedules() {
     // Base API URL: set VITE_API_URL in your frontend host (Vercel/Render) to point to the backend
@@ -58,11 +59,14 @@ export default function Schedules() {
             if (params?.q) parts.push(`q=${encodeURIComponent(params.q)}`);
             if (params?.start) parts.push(`start=${encodeURIComponent(params.start)}`);
             if (params?.end) parts.push(`end=${encodeURIComponent(params.end)}`);
+            // without dates a search uses the server's default window; the calendar asks for the days it shows
+            if (!params?.start && !params?.end && !params?.q) parts.push(rangeParams(visibleRange(viewMode, selectedDate)));
+            // names come embedded so rows don't have to be joined against the intern/patient lists
+            parts.push('expand=intern,patient');
             if (params?.filterBy && params.filterBy !== 'any') parts.push(`filter_by=${encodeURIComponent(params.filterBy)}`);
             const url = `${API_BASE}/api/schedules/${parts.length ? '?' + parts.join('&') : ''}`;
-            const resp = await fetch(url, { headers: { Authorization: `Bearer ${token}` } });
-            if (resp.ok) setSchedules(await resp.json());
-            else console.error(await resp.text());
+            const rows = await fetchList(url, { headers: { Authorization: `Bearer ${token}` } });
+            if (rows) setSchedules(rows);
         } catch (err) {
             console.error(err);
         } finally { setLoading(false); }
@@ -71,8 +75,9 @@ export default function Schedules() {
     const fetchAvailabilities = async () => {
         try{
             const token = localStorage.getItem('access_token');
-            const resp = await fetch(`${API_BASE}/api/availabilities/`, { headers: { Authorization: `Bearer ${token}` } });
-            if(resp.ok) setAvailabilities(await resp.json());
+            const range = rangeParams(visibleRange(viewMode, selectedDate));
+            const rows = await fetchList(`${API_BASE}/api/availabilities/?${range}&expand=intern`, { headers: { Authorization: `Bearer ${token}` } });
+            if (rows) setAvailabilities(rows);
         }catch(e){ console.error(e); }
     };
 
@@ -95,12 +100,16 @@ export default function Schedules() {
     const fetchPatientAvailabilities = async () => {
         try{
             const token = localStorage.getItem('access_token');
-            const resp = await fetch(`${API_BASE}/api/patientavailabilities/`, { headers: { Authorization: `Bearer ${token}` } });
-            if(resp.ok) setPatientAvailabilities(await resp.json());
+            const range = rangeParams(visibleRange(viewMode, selectedDate));
+            const rows = await fetchList(`${API_BASE}/api/patientavailabilities/?${range}&expand=patient`, { headers: { Authorization: `Bearer ${token}` } });
+            if (rows) setPatientAvailabilities(rows);
         }catch(e){ console.error(e); }
     };
 
-    useEffect(() => { fetchSchedules(); fetchAvailabilities(); fetchPatientAvailabilities(); fetchInterns(); fetchPatients(); }, []);
+    useEffect(() => { fetchInterns(); fetchPatients(); }, []);
+
+    // availabilities follow the calendar: refetched for the days shown when it moves
+    useEffect(() => { fetchAvailabilities(); fetchPatientAvailabilities(); }, [viewMode, selectedDate]);
 
     // debounce search queries to avoid firing on every keystroke
     useEffect(() => {
@@ -108,7 +117,7 @@ export default function Schedules() {
             fetchSchedules({ q, start, end, filterBy });
         }, 300);
         return () => clearTimeout(id);
-    }, [q, start, end, filterBy]);
+    }, [q, start, end, filterBy, viewMode, selectedDate]);
 
     const handleSearch = (e: React.FormEvent) => {
         e.preventDefault();
@@ -149,8 +158,8 @@ export default function Schedules() {
             if (cur.getMinutes() !== 0 || cur.getSeconds() !== 0) { cur.setMinutes(0,0,0); cur.setHours(cur.getHours()+1); }
             while (cur.getTime() + 3600*1000 <= e.getTime()) {
                 const slotEnd = new Date(cur.getTime() + 3600*1000);
-                const internId = a.intern ?? a.intern_id ?? a.internId ?? null;
-                const it = interns.find(i => i.id === internId) || interns.find(i => String(i.id) === String(internId));
+                const internId = idOf(a.intern ?? a.intern_id ?? a.internId ?? null);
+                const it = (typeof a.intern === 'object' && a.intern) || interns.find(i => String(i.id) === String(internId));
                 slots.push({ internId: internId, internName: it ? `${it.first_name} ${it.last_name}` : 'Estagiário', start: new Date(cur), end: slotEnd });
                 cur = slotEnd;
             }
@@ -169,8 +178,8 @@ export default function Schedules() {
             if (cur.getMinutes() !== 0 || cur.getSeconds() !== 0) { cur.setMinutes(0,0,0); cur.setHours(cur.getHours()+1); }
             while (cur.getTime() + 3600*1000 <= e.getTime()) {
                 const slotEnd = new Date(cur.getTime() + 3600*1000);
-                const patientId = pa.patient ?? pa.patient_id ?? pa.patientId ?? null;
-                const pt = patients.find(p => p.id === patientId) || patients.find(p => String(p.id) === String(patientId));
+                const patientId = idOf(pa.patient ?? pa.patient_id ?? pa.patientId ?? null);
+                const pt = (typeof pa.patient === 'object' && pa.patient) || patients.find(p => String(p.id) === String(patientId));
                 slots.push({ patientId, patientName: pt ? `${pt.first_name} ${pt.last_name}` : findPersonName(patients, patientId), start: new Date(cur), end: slotEnd, parentId: pa.id });
                 cur = slotEnd;
             }
@@ -178,8 +187,12 @@ export default function Schedules() {
         return slots;
     };
     
+    // expanded rows carry { id, first_name, last_name } instead of a bare id
+    const idOf = (value: any) => (typeof value === 'object' && value !== null) ? (value.id ?? null) : value;
+
     const findPersonName = (list: any[], value: any) => {
         if (value == null) return '';
+        if (typeof value === 'object' && (value.first_name || value.last_name)) return `${value.first_name || ''} ${value.last_name || ''}`.trim();
         // value might be an id number/string or an object
         const id = (typeof value === 'object' && value !== null) ? (value.id ?? value.patient_id ?? value.intern_id ?? null) : value;
         if (id != null) {
@@ -197,11 +210,11 @@ export default function Schedules() {
         return String(value);
     };
     const findPersonShortName = (list: any[], value: any) => {
-        // prefer resolving from list
         if (value == null) return '';
         const id = (typeof value === 'object' && value !== null) ? (value.id ?? value.patient_id ?? value.intern_id ?? null) : value;
-        let found = null;
-        if (id != null) found = list.find(u => String(u.id) === String(id));
+        // embedded names first, then the list
+        let found = (typeof value === 'object' && value !== null && (value.first_name || value.last_name)) ? value : null;
+        if (!found && id != null) found = list.find(u => String(u.id) === String(id));
         if (!found && typeof value === 'object' && value !== null) found = value;
         const name = found ? (`${found.first_name || ''}`.trim() + (found.last_name ? ` ${String(found.last_name).split(' ')[0].slice(0,1)}.` : '')) : null;
         if (name) return name;
@@ -216,7 +229,7 @@ export default function Schedules() {
     const slotIsOccupied = (internId: any, start: Date, end: Date) => {
         return schedules.some(s => {
             try{
-                const sid = s.intern ?? s.intern_id ?? s.internId ?? null;
+                const sid = idOf(s.intern ?? s.intern_id ?? s.internId ?? null);
                 if (String(sid) !== String(internId)) return false;
                 const ss = new Date(s.start_time);
                 const se = new Date(s.end_time);
@@ -1,6 +1,7 @@
 import React, { useEffect, useState } from 'react';
 import { useParams } from 'react-router-dom';
 import '../PatientDetail/PatientDetail.css';
+import { fetchList, rangeParams, visibleRange } from '../../fetchList';
 
 export default function UserDetail(){
     const API_BASE = (import.meta && import.meta.env && (import.meta.env.VITE_API_URL as string)) || 'http://localhost:8000';
@@ -24,20 +25,22 @@ export default function UserDetail(){
     const fetchSchedules = async () => {
         try{
             const token = localStorage.getItem('access_token');
-            const resp = await fetch(`${API_BASE}/api/schedules/?intern=${id}`, { headers: { Authorization: `Bearer ${token}` } });
-            if(resp.ok) setSchedules(await resp.json());
+            const rows = await fetchList(`${API_BASE}/api/schedules/?intern=${id}&${rangeParams(visibleRange(viewMode, selectedDate))}`, { headers: { Authorization: `Bearer ${token}` } });
+            if (rows) setSchedules(rows);
         }catch(e){ console.error(e); }
     };
 
     const fetchAvailabilities = async () => {
         try{
             const token = localStorage.getItem('access_token');
-            const resp = await fetch(`${API_BASE}/api/availabilities/?intern=${id}`, { headers: { Authorization: `Bearer ${token}` } });
-            if(resp.ok) setAvailabilities(await resp.json());
+            const rows = await fetchList(`${API_BASE}/api/availabilities/?intern=${id}&${rangeParams(visibleRange(viewMode, selectedDate))}`, { headers: { Authorization: `Bearer ${token}` } });
+            if (rows) setAvailabilities(rows);
         }catch(e){ console.error(e); }
     };
 
-    useEffect(()=>{ fetchIntern(); fetchSchedules(); fetchAvailabilities(); }, [id]);
+    useEffect(()=>{ fetchIntern(); }, [id]);
+    // only the days on screen; refetched when the calendar moves
+    useEffect(()=>{ fetchSchedules(); fetchAvailabilities(); }, [id, viewMode, selectedDate]);
 
     const handleChange = (e: React.ChangeEvent<HTMLInputElement>) => setForm({ ...form, [e.target.name]: e.target.value });
 